@@ -1,5 +1,5 @@
 import os
-import json
+from .utils import read_json, write_json
 
 def relative_path(path, goback=0):
     levels = [".."] * (goback + -1)
@@ -40,12 +40,10 @@ class JSONStorageBackend(BasicStorageBackend):
         if not os.path.isfile(self.json_path):
             self.commit_to_disk()
 
-        with open(self.json_path, "r") as json_file:
-            self.json_data = json.load(json_file)
+        self.json_data = read_json(self.json_path)
         
     def commit_to_disk(self):
-        with open(self.json_path, "w") as json_file:
-            json.dump(self.json_data, json_file, indent=4)
+        write_json(self.json_data, self.json_path)
 
     def get_item(self, key: str, default = None) -> str:
         if key in self.json_data:
@@ -1,11 +1,17 @@
-import json
-import os
-from hashlib import md5
-from joblib import Parallel, delayed
-from shutil import rmtree
-from json.decoder import JSONDecodeError
-from .decorators_utils import create_cache_directory_if_not_exists, create_directory_if_not_exists
-from .utils import read_json, relative_path, write_json
+from threading import Lock, Thread
+from time import sleep, time
+from traceback import print_exc
+from .cache_backends import (
+    BasicCacheBackend,
+    FileCacheBackend,
+    SqliteCacheBackend,
+    migrate_file_cache_to_sqlite,
+)
+from .cache_codecs import GZIP, JSON, MSGPACK, ZSTD
+from .cache_keys import hash_key, is_legacy_key, legacy_hash_key
+from .cache_memory import MemoryCache
+from .cache_policy import LFU, LRU, CachePolicy, is_expired
+from .decorators_utils import create_cache_directory_if_not_exists
 
 class DontCache:
     def __init__(self, result):
@@ -14,63 +20,156 @@ class DontCache:
 def is_dont_cache(obj):
     return isinstance(obj, DontCache)
 
-def _get_cache_path(func, data):
+_ignored_fields = {}
+
+def _hash(data, fn_name=None):
+    return hash_key(data, _ignored_fields.get(fn_name))
+
+
+_backend = FileCacheBackend()
+
+# Seconds between two runs of the background thread enforcing the cache policies
+ENFORCE_INTERVAL = 60
+
+_policies = {}
+_stats = {}
+# The accesses since the policies were last enforced, as {fn_name: {key: (accessed_at, hits)}}
+_accesses = {}
+_lock = Lock()
+_enforcer = None
+
+_memory = MemoryCache()
+# The created_at of every key in the backend as {fn_name: {key: created_at}}, so misses never touch the backend.
+# Built on the first lookup of each function, and kept up to date by the writes of this process.
+_indexes = {}
+# Functions whose cache still holds results keyed by the md5 of their input, from before canonical keys
+_legacy_fns = set()
+
+def _create_stats():
+    return {"hits": 0, "memory_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+def _get_index(fn_name):
+    index = _indexes.get(fn_name)
+    if index is None:
+        index = {entry.key: entry.created_at for entry in _backend.entries(fn_name)}
+        if any(is_legacy_key(key) for key in index):
+            _legacy_fns.add(fn_name)
+        _indexes[fn_name] = index
+    return index
+
+def _find_key(fn_name, data):
+    """Returns the key data is cached under, or None if it is not cached."""
+    index = _get_index(fn_name)
+    key = _hash(data, fn_name)
+    if key in index:
+        return key
+
+    if fn_name in _legacy_fns:
+        key = legacy_hash_key(data)
+        if key in index:
+            return key
+    return None
+
+def _get_keys(fn_name, data):
+    """Returns the key of data, along with its legacy key if the function may still have legacy keys."""
+    keys = [_hash(data, fn_name)]
+    # Building the index tells whether the function has legacy keys
+    _get_index(fn_name)
+    if fn_name in _legacy_fns:
+        keys.append(legacy_hash_key(data))
+    return keys
+
+def _add_to_index(fn_name, keys):
+    index = _indexes.get(fn_name)
+    now = time()
+    for key in keys:
+        if index is not None:
+            index[key] = now
+        _memory.remove((fn_name, key))
+
+def _remove_from_index(fn_name, keys):
+    index = _indexes.get(fn_name)
+    for key in keys:
+        if index is not None:
+            index.pop(key, None)
+        _memory.remove((fn_name, key))
+
+def _remove_keys(fn_name, keys):
+    index = _get_index(fn_name)
+    keys = [key for key in keys if key in index]
+    if keys:
+        _remove_from_index(fn_name, keys)
+        _backend.remove_many(fn_name, keys)
+
+def _get_cached(func, data):
+    """Returns a (found, value) tuple for the cached result of func for data."""
     fn_name = func.__name__
-    fn_cache_dir = f'cache/{fn_name}/'
-
-    # Serialize the data to a JSON string and encode to bytes
-    serialized_data = json.dumps(data).encode('utf-8')
-    
-    # Generate a hash from the serialized data
-    data_hash = md5(serialized_data).hexdigest()
-
-    # Create a unique cache file path with a .json extension
-    cache_path = os.path.join(fn_cache_dir, data_hash + ".json")
-    return cache_path
-
-def _hash( data):
-    # Serialize the data to a JSON string and encode to bytes
-    serialized_data = json.dumps(data).encode('utf-8')
-    
-    # Generate a hash from the serialized data
-    return  md5(serialized_data).hexdigest()
-
-
-def _has(cache_path):
-    return os.path.exists(cache_path)
-
-def _get(cache_path):
-    try:
-        return read_json(cache_path)
-    except JSONDecodeError:
-        return None
-
-
-def _read_json_files(file_paths):
-    results = Parallel(n_jobs=-1)(delayed(_get)(file_path) for file_path in file_paths)
-    return results
-
-def _delete_item_by_path(cache_path):
-    os.remove(cache_path)
-
-def _delete_items(file_paths):
-    Parallel(n_jobs=-1)(delayed(_delete_item_by_path)(file_path) for file_path in file_paths)
-
-def _put(result, cache_path):
-    write_json(result, cache_path)
-
-def _remove(cache_path):
-    if os.path.exists(cache_path):
-        os.remove(cache_path)
-
-def get_files_without_json_extension(directory_path):
-    # Get a list of all files in the directory
-    files = os.listdir(directory_path)
-    
-    # Use rstrip to remove the .json extension from all filenames in the list
-    files_without_json_extension = [file.rstrip('.json') for file in files]
-    
-    return files_without_json_extension
+    key = _find_key(fn_name, data)
+    policy = _policies.get(fn_name)
+    ttl = policy.ttl if policy is not None else None
+
+    found, value, from_memory = False, None, False
+    created_at = _get_index(fn_name).get(key)
+    if created_at is not None and not is_expired(created_at, ttl):
+        found, value = _memory.get((fn_name, key))
+        from_memory = found
+        if not found:
+            found, value = _backend.get(fn_name, key, ttl)
+            if found:
+                _memory.put((fn_name, key), value)
+            else:
+                # Removed by another process
+                _remove_from_index(fn_name, [key])
+
+    with _lock:
+        stats = _stats.setdefault(fn_name, _create_stats())
+        stats["hits" if found else "misses"] += 1
+        if from_memory:
+            stats["memory_hits"] += 1
+        if found and policy is not None:
+            accesses = _accesses.setdefault(fn_name, {})
+            _, hits = accesses.get(key, (None, 0))
+            accesses[key] = (time(), hits + 1)
+
+    return found, value
+
+
+def _enforce_policy(fn_name, policy):
+    with _lock:
+        accesses = _accesses.pop(fn_name, None)
+    if accesses:
+        _backend.record_access(fn_name, accesses)
+
+    entries = _backend.entries(fn_name)
+    expired = policy.select_expired(entries)
+    expired_keys = set(entry.key for entry in expired)
+    evicted = policy.select_evicted([entry for entry in entries if entry.key not in expired_keys])
+
+    removed = [entry.key for entry in expired + evicted]
+    if removed:
+        _remove_from_index(fn_name, removed)
+        _backend.remove_many(fn_name, removed)
+
+    with _lock:
+        stats = _stats.setdefault(fn_name, _create_stats())
+        stats["expirations"] += len(expired)
+        stats["evictions"] += len(evicted)
+
+
+def _run_enforcer():
+    while True:
+        sleep(ENFORCE_INTERVAL)
+        try:
+            Cache.enforce_policies()
+        except Exception:
+            print_exc()
+
+
+def _start_enforcer():
+    global _enforcer
+    if _enforcer is None:
+        _enforcer = Thread(target=_run_enforcer, daemon=True)
+        _enforcer.start()
 
 
 created_fns = set()
@@ -88,110 +187,251 @@ def _create_cache_directory_if_not_exists(func=None):
             
             if fn_name not in created_fns:
                 created_fns.add(fn_name)
-                fn_cache_dir = f'cache/{fn_name}/'
-                create_directory_if_not_exists(fn_cache_dir)
+                _backend.setup(fn_name)
 
 class Cache:
 
     REFRESH = "REFRESH"
+
+    FILE = "FILE"
+    SQLITE = "SQLITE"
+
+    JSON = JSON
+    GZIP = GZIP
+    ZSTD = ZSTD
+    MSGPACK = MSGPACK
+
+    LRU = LRU
+    LFU = LFU
+
+    @staticmethod
+    def set_backend(backend):
+        """
+        Sets where cached results are stored.
+
+        :param backend: Cache.FILE for a JSON file per result (default), Cache.SQLITE for a single
+                        sqlite database at cache/cache.db, or an instance of a BasicCacheBackend subclass.
+        """
+        global _backend, created_fns
+        if backend == Cache.FILE:
+            backend = FileCacheBackend(_backend.codec)
+        elif backend == Cache.SQLITE:
+            backend = SqliteCacheBackend(codec=_backend.codec)
+        _backend = backend
+        created_fns = set()
+        _indexes.clear()
+        _memory.clear()
+
+    @staticmethod
+    def set_memory_limit(max_bytes):
+        """
+        Sets the maximum size of the recently read results kept in memory, which repeated lookups
+        read without touching the disk. 0 disables keeping results in memory.
+        """
+        _memory.set_limit(max_bytes)
+
+    @staticmethod
+    def set_codec(codec):
+        """
+        Sets how new results are encoded. Results are always read back whatever codec they were written with.
+
+        :param codec: Cache.JSON for pretty printed JSON (default), Cache.GZIP or Cache.ZSTD for compressed
+                      compact JSON, or Cache.MSGPACK. Cache.ZSTD and Cache.MSGPACK need the zstandard
+                      and msgpack packages.
+        """
+        _backend.codec = codec
+
+    @staticmethod
+    def get_backend():
+        return _backend
+
+    @staticmethod
+    def set_policy(func, ttl=None, max_entries=None, max_bytes=None, eviction=LRU):
+        """
+        Limits how long and how many results of func are cached. Expired results are not read, and
+        a background thread removes expired results and evicts results over the limits every ENFORCE_INTERVAL seconds.
+
+        :param func: The cached function.
+        :param ttl: Seconds after which a cached result expires, None to never expire.
+        :param max_entries: Maximum number of cached results, None for no limit.
+        :param max_bytes: Maximum total size of the cached results in bytes, None for no limit.
+        :param eviction: Cache.LRU to evict the least recently used results first, Cache.LFU to evict the least frequently used ones first.
+        """
+        _create_cache_directory_if_not_exists(func)
+        _policies[func.__name__] = CachePolicy(ttl, max_entries, max_bytes, eviction)
+        _start_enforcer()
+
+    @staticmethod
+    def enforce_policies():
+        """Removes the expired results and evicts the results over the limits of every policy now."""
+        for fn_name, policy in list(_policies.items()):
+            _enforce_policy(fn_name, policy)
+
+    @staticmethod
+    def stats(func=None):
+        """
+        Returns the hits, memory hits, misses, evictions and expirations since the process started, along with
+        the hit rate and the number of entries and bytes now cached, of func or of all functions.
+        """
+        if func is not None:
+            _create_cache_directory_if_not_exists(func)
+            fn_names = [func.__name__]
+        else:
+            fn_names = _backend.fn_names()
+
+        result = _create_stats()
+        with _lock:
+            for fn_name, stats in _stats.items():
+                if func is None or fn_name == func.__name__:
+                    for name, count in stats.items():
+                        result[name] += count
+
+        lookups = result["hits"] + result["misses"]
+        result["hit_rate"] = result["hits"] / lookups if lookups else 0
+        entries = [entry for fn_name in fn_names for entry in _backend.entries(fn_name)]
+        result["entries"] = len(entries)
+        result["bytes"] = sum(entry.size for entry in entries)
+        return result
     
     @staticmethod
     def put(func, key_data, data):
-        """Write data to a cache file in JSON format."""
+        """Write data to the cache."""
+        _create_cache_directory_if_not_exists(func)
+        key, *legacy_keys = _get_keys(func.__name__, key_data)
+        _backend.put(func.__name__, key, data)
+        _add_to_index(func.__name__, [key])
+        _remove_keys(func.__name__, legacy_keys)
+
+    @staticmethod
+    def put_items(func, items, results):
+        """Write the results of many items to the cache at once."""
         _create_cache_directory_if_not_exists(func)
-        path = _get_cache_path(func, key_data)
-        _put(data, path)
+        entries = []
+        legacy_keys = []
+        for item, result in zip(items, results):
+            key, *item_legacy_keys = _get_keys(func.__name__, item)
+            entries.append((key, result))
+            legacy_keys.extend(item_legacy_keys)
+        _backend.put_many(func.__name__, entries)
+        _add_to_index(func.__name__, [key for key, _ in entries])
+        # Like put, so that the items are not found under their legacy keys after they are removed
+        _remove_keys(func.__name__, legacy_keys)
 
     @staticmethod
-    def hash(data):
-        return _hash(data)
+    def hash(data, func=None):
+        return _hash(data, func.__name__ if func is not None else None)
+
+    @staticmethod
+    def set_ignored_key_fields(func, fields):
+        """
+        Leaves fields out of the cache key when the input of func is a dict,
+        so inputs which only differ in fields that don't change the result share the cached result.
+        """
+        _ignored_fields[func.__name__] = frozenset(fields)
 
     @staticmethod
     def filter_items_not_in_cache(func, items):
-        cached_items  = set(Cache.get_items_hashes(func))
-        return [item for item in items if Cache.hash(item) not in cached_items]
+        _create_cache_directory_if_not_exists(func)
+        return [item for item in items if _find_key(func.__name__, item) is None]
             
 
     @staticmethod
     def filter_items_in_cache(func, items):
-        cached_items  = set(Cache.get_items_hashes(func))
-        return [item for item in items if Cache.hash(item) in cached_items]
+        _create_cache_directory_if_not_exists(func)
+        return [item for item in items if _find_key(func.__name__, item) is not None]
                         
     @staticmethod
     def has(func, key_data):
         _create_cache_directory_if_not_exists(func)
-        path = _get_cache_path(func, key_data)
-        return _has(path)
+        policy = _policies.get(func.__name__)
+        created_at = _get_index(func.__name__).get(_find_key(func.__name__, key_data))
+        return created_at is not None and not is_expired(created_at, policy.ttl if policy is not None else None)
 
     @staticmethod
     def get(func, key_data):
-        """Read data from a cache file."""
+        """Read data from the cache."""
         _create_cache_directory_if_not_exists(func)
-        path = _get_cache_path(func, key_data)
-        if _has(path):
-            return _get(path)
-        return None
+        found, value = _get_cached(func, key_data)
+        return value if found else None
 
 
     @staticmethod
     def get_items(func, items=None):
+        return list(Cache.iter_items(func, items))
+
+    @staticmethod
+    def iter_items(func, items=None):
+        """
+        Yields the cached results of items, or of all items when items is None, reading them ahead in a thread pool.
+        Unlike get_items, the whole cache is never held in memory at once.
+        """
         hashes = Cache.get_items_hashes(func, items)
-        fn_name = func.__name__
-        paths = [relative_path(f'cache/{fn_name}/{r}.json') for r in hashes]
-        return _read_json_files(paths)
+        return _backend.iter_many(func.__name__, hashes)
 
     @staticmethod
     def get_items_hashes(func, items=None):
         fn_name = func.__name__
-        fn_cache_dir = f'cache/{fn_name}/'
-        cache_dir = relative_path(fn_cache_dir)
-        results =  get_files_without_json_extension(cache_dir)
+        _create_cache_directory_if_not_exists(func)
 
         if items is None:
-            return results
+            return _backend.keys(fn_name)
         else: 
-            items  = set([Cache.hash(item) for item in items])
-            return [r for r in results if r in items]
+            keys = (_find_key(fn_name, item) for item in items)
+            return list(dict.fromkeys(key for key in keys if key is not None))
 
     @staticmethod
     def remove(func, key_data):
-        """Remove a specific cache file."""
+        """Remove a specific cached result."""
         _create_cache_directory_if_not_exists(func)
-        path = _get_cache_path(func, key_data)
-        _remove(path)
+        _remove_keys(func.__name__, _get_keys(func.__name__, key_data))
 
     @staticmethod
     def remove_items(func, items):
 
-        """Remove a specific cache file."""
-        hashes = Cache.get_items_hashes(func, items)
+        """Remove the cached results of many items."""
         fn_name = func.__name__
-        paths = [relative_path(f'cache/{fn_name}/{r}.json') for r in hashes]
-        _delete_items(paths)
-        return len(hashes)
+        _create_cache_directory_if_not_exists(func)
+        if items is None:
+            hashes = _backend.keys(fn_name)
+            _remove_from_index(fn_name, hashes)
+            _backend.remove_many(fn_name, hashes)
+            return len(hashes)
+
+        # The legacy key of an item is removed along with its key, or the next lookup would find the stale result under it
+        index = _get_index(fn_name)
+        cached_keys = dict.fromkeys(tuple(key for key in _get_keys(fn_name, item) if key in index) for item in items)
+        cached_keys.pop((), None)
+        _remove_keys(fn_name, [key for keys in cached_keys for key in keys])
+        return len(cached_keys)
 
     @staticmethod
     def clear(func=None):
-        """Clear all cache files. 
+        """Clear all cached results. 
         If func is specified, clear cache for that specific function, 
-        otherwise clear the entire cache directory."""
+        otherwise clear the entire cache."""
         global cache_check_done, created_fns
 
         if func is not None:
             fn_name = func.__name__
-            fn_cache_dir = f'cache/{fn_name}/'
-            cache_dir = relative_path(fn_cache_dir)
-            if os.path.exists(cache_dir):
-                rmtree(cache_dir, ignore_errors=True)
+            _backend.clear(fn_name)
+            _indexes.pop(fn_name, None)
+            _memory.clear(fn_name)
             if fn_name in created_fns:
                 created_fns.remove(fn_name)
         else:
-            cache_dir = relative_path('cache/')
-            if os.path.exists(cache_dir):
-                rmtree(cache_dir, ignore_errors=True)
+            _backend.clear()
+            _indexes.clear()
+            _memory.clear()
             cache_check_done = False
             created_fns = set()
 
+    @staticmethod
+    def migrate_to_sqlite(delete_files=False):
+        """Copy the cached JSON files into cache/cache.db, for use with Cache.set_backend(Cache.SQLITE)."""
+        _create_cache_directory_if_not_exists()
+        backend = _backend if isinstance(_backend, SqliteCacheBackend) else SqliteCacheBackend(codec=_backend.codec)
+        return migrate_file_cache_to_sqlite(backend, delete_files=delete_files)
+
 
 
 if __name__ == "__main__":
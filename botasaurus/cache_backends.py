@@ -0,0 +1,455 @@
+import os
+import sqlite3
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from shutil import rmtree
+from time import time
+from .cache_policy import CacheEntry, is_expired
+from .cache_codecs import CODECS, DECODE_ERRORS, EXTENSIONS, JSON, decode, encode
+from .decorators_utils import create_cache_directory_if_not_exists, create_directory_if_not_exists
+from .utils import relative_path
+
+# Keeps the number of bound variables of a query below the sqlite limit
+SQLITE_BATCH_SIZE = 500
+
+# Files read or deleted per task of the thread pool, which keeps the overhead of the pool low
+BULK_CHUNK_SIZE = 256
+# Chunks read ahead of the consumer of iter_many
+BULK_PREFETCH = 8
+
+
+class CacheBackendException(Exception):
+    pass
+
+
+class BasicCacheBackend:
+    def raise_dummy_exception(self):
+        raise CacheBackendException("Called dummy backend!")
+
+    def setup(self, fn_name: str) -> None:
+        self.raise_dummy_exception()
+
+    def has(self, fn_name: str, key: str, ttl=None) -> bool:
+        self.raise_dummy_exception()
+
+    def get(self, fn_name: str, key: str, ttl=None):
+        """Returns a (found, value) tuple, results older than ttl seconds are not found."""
+        self.raise_dummy_exception()
+
+    def get_many(self, fn_name: str, keys: list) -> list:
+        return list(self.iter_many(fn_name, keys))
+
+    def iter_many(self, fn_name: str, keys: list):
+        """Yields the value of every key in order, None for missing keys."""
+        self.raise_dummy_exception()
+
+    def put(self, fn_name: str, key: str, value) -> None:
+        self.raise_dummy_exception()
+
+    def put_many(self, fn_name: str, entries: list) -> None:
+        self.raise_dummy_exception()
+
+    def remove(self, fn_name: str, key: str) -> None:
+        self.raise_dummy_exception()
+
+    def remove_many(self, fn_name: str, keys: list) -> None:
+        self.raise_dummy_exception()
+
+    def keys(self, fn_name: str) -> list:
+        self.raise_dummy_exception()
+
+    def existing_keys(self, fn_name: str, keys: list) -> set:
+        self.raise_dummy_exception()
+
+    def fn_names(self) -> list:
+        self.raise_dummy_exception()
+
+    def entries(self, fn_name: str) -> list:
+        """Returns a CacheEntry for every cached result of the function."""
+        self.raise_dummy_exception()
+
+    def record_access(self, fn_name: str, accesses: dict) -> None:
+        """Records the (accessed_at, hits) of each key in accesses, used by LRU and LFU eviction."""
+        self.raise_dummy_exception()
+
+    def clear(self, fn_name: str = None) -> None:
+        self.raise_dummy_exception()
+
+
+def batched(ls, size=SQLITE_BATCH_SIZE):
+    for index in range(0, len(ls), size):
+        yield ls[index:index + size]
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=min(32, os.cpu_count() or 1), thread_name_prefix="botasaurus-cache")
+    return _executor
+
+
+def map_chunks(fn, items, chunk_size=BULK_CHUNK_SIZE, prefetch=BULK_PREFETCH):
+    """
+    Runs fn on chunks of items in a thread pool shared by all bulk operations, and yields the results in order.
+    At most prefetch chunks are read ahead, so streaming a whole cache doesn't hold it all in memory.
+    """
+    if (os.cpu_count() or 1) == 1:
+        # Decoding holds the GIL, so on a single core threads only add switching
+        for chunk in batched(items, chunk_size):
+            yield from fn(chunk)
+        return
+
+    executor = get_executor()
+    pending = deque()
+    for chunk in batched(items, chunk_size):
+        pending.append(executor.submit(fn, chunk))
+        if len(pending) >= prefetch:
+            yield from pending.popleft().result()
+    while pending:
+        yield from pending.popleft().result()
+
+
+def read_cache_file(cache_path):
+    try:
+        with open(cache_path, "rb") as fp:
+            return decode(fp.read())
+    except DECODE_ERRORS:
+        return None
+
+
+def write_cache_file(value, cache_path, codec=JSON):
+    with open(cache_path, "wb") as fp:
+        # Cache files are only read by the cache, so they are written compact
+        fp.write(encode(value, codec, indent=None))
+
+
+class FileCacheBackend(BasicCacheBackend):
+    """
+    Stores every result as its own file at cache/<fn_name>/<key><extension>, where the extension
+    is .json, or the extension of the compressed codec the result was written with.
+    """
+
+    def __init__(self, codec=JSON):
+        self.codec = codec
+        # Files have no place to store hit counts, so LFU uses the hits since the process started
+        self.hits = {}
+
+    def get_path(self, fn_name, key, codec=None):
+        return relative_path(f'cache/{fn_name}/{key}{EXTENSIONS[codec or self.codec]}')
+
+    def get_codecs(self):
+        # Results written before switching the codec are still read
+        return [self.codec] + [codec for codec in CODECS if codec != self.codec]
+
+    def find_path(self, fn_name, key):
+        for codec in self.get_codecs():
+            path = self.get_path(fn_name, key, codec)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def setup(self, fn_name):
+        create_directory_if_not_exists(f'cache/{fn_name}/')
+
+    def has(self, fn_name, key, ttl=None):
+        path = self.find_path(fn_name, key)
+        return path is not None and not (ttl is not None and is_expired(os.path.getmtime(path), ttl))
+
+    def get(self, fn_name, key, ttl=None):
+        path = self.find_path(fn_name, key)
+        if path is None or (ttl is not None and is_expired(os.path.getmtime(path), ttl)):
+            return False, None
+        return True, read_cache_file(path)
+
+    def get_paths(self, fn_name, keys):
+        """Yields the paths of every codec for each key, resolving the folder of fn_name only once."""
+        directory = os.path.join(relative_path(f'cache/{fn_name}/'), '')
+        extensions = [EXTENSIONS[codec] for codec in self.get_codecs()]
+        for key in keys:
+            yield [directory + key + extension for extension in extensions]
+
+    def read_chunk(self, fn_name, keys):
+        values = []
+        for paths in self.get_paths(fn_name, keys):
+            value = None
+            # Opening the files right away saves checking that they exist
+            for path in paths:
+                try:
+                    value = read_cache_file(path)
+                    break
+                except FileNotFoundError:
+                    pass
+            values.append(value)
+        return values
+
+    def iter_many(self, fn_name, keys):
+        return map_chunks(partial(self.read_chunk, fn_name), keys)
+
+    def put(self, fn_name, key, value):
+        write_cache_file(value, self.get_path(fn_name, key), self.codec)
+
+    def put_many(self, fn_name, entries):
+        for key, value in entries:
+            self.put(fn_name, key, value)
+
+    def remove(self, fn_name, key):
+        self.remove_chunk(fn_name, [key])
+
+    def remove_chunk(self, fn_name, keys):
+        # Removing right away saves checking which of the files of each key exist
+        for paths in self.get_paths(fn_name, keys):
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        return []
+
+    def remove_many(self, fn_name, keys):
+        for _ in map_chunks(partial(self.remove_chunk, fn_name), keys):
+            pass
+
+    def keys(self, fn_name):
+        files = os.listdir(relative_path(f'cache/{fn_name}/'))
+        # Strip the extension of any codec, a key may have been written with several of them
+        return list(dict.fromkeys(file.split('.')[0] for file in files))
+
+    def existing_keys(self, fn_name, keys):
+        return set(self.keys(fn_name)).intersection(keys)
+
+    def fn_names(self):
+        cache_dir = relative_path('cache/')
+        if not os.path.exists(cache_dir):
+            return []
+        return [name for name in os.listdir(cache_dir) if os.path.isdir(os.path.join(cache_dir, name))]
+
+    def entries(self, fn_name):
+        entries = {}
+        with os.scandir(relative_path(f'cache/{fn_name}/')) as files:
+            for file in files:
+                stat = file.stat()
+                key = file.name.split('.')[0]
+                # A key written with several codecs takes up the size of all its files
+                size = stat.st_size + (entries[key].size if key in entries else 0)
+                hits = self.hits.get((fn_name, key), 0)
+                entries[key] = CacheEntry(key, stat.st_mtime, max(stat.st_atime, stat.st_mtime), hits, size)
+        return list(entries.values())
+
+    def record_access(self, fn_name, accesses):
+        for key, (accessed_at, hits) in accesses.items():
+            path = self.find_path(fn_name, key)
+            if path is not None:
+                # The access time of the file is the last use, the modification time stays the creation time
+                os.utime(path, (accessed_at, os.path.getmtime(path)))
+                self.hits[(fn_name, key)] = self.hits.get((fn_name, key), 0) + hits
+
+    def clear(self, fn_name=None):
+        cache_dir = relative_path(f'cache/{fn_name}/' if fn_name is not None else 'cache/')
+        if os.path.exists(cache_dir):
+            rmtree(cache_dir, ignore_errors=True)
+
+
+class SqliteCacheBackend(BasicCacheBackend):
+    """
+    Stores all results in a single sqlite database in WAL mode, with a (fn_name, key) primary key.
+    Avoids creating a file per result, which runs out of inodes and makes listing slow for large caches.
+    """
+
+    def __init__(self, path='cache/cache.db', codec=JSON):
+        self.path = path
+        self.codec = codec
+        # sqlite connections can't be shared between threads
+        self._local = threading.local()
+
+    def get_connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            create_directory_if_not_exists(os.path.dirname(self.path) or '.')
+            connection = sqlite3.connect(relative_path(self.path), timeout=60, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS cache (
+                    fn_name TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value BLOB,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (fn_name, key)
+                ) WITHOUT ROWID"""
+            )
+            # Databases created before eviction was supported lack the access columns
+            columns = [row[1] for row in connection.execute("PRAGMA table_info(cache)")]
+            if "accessed_at" not in columns:
+                connection.execute("ALTER TABLE cache ADD COLUMN accessed_at REAL")
+            if "hits" not in columns:
+                connection.execute("ALTER TABLE cache ADD COLUMN hits INTEGER NOT NULL DEFAULT 0")
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def encode(self, value):
+        return encode(value, self.codec, indent=None)
+
+    def decode(self, value):
+        try:
+            return decode(value)
+        except DECODE_ERRORS:
+            return None
+
+    def setup(self, fn_name):
+        self.get_connection()
+
+    def has(self, fn_name, key, ttl=None):
+        row = self.get_connection().execute(
+            "SELECT 1 FROM cache WHERE fn_name = ? AND key = ? AND created_at >= ?",
+            (fn_name, key, time() - ttl if ttl is not None else float("-inf")),
+        ).fetchone()
+        return row is not None
+
+    def get(self, fn_name, key, ttl=None):
+        if ttl is None:
+            row = self.get_connection().execute(
+                "SELECT value FROM cache WHERE fn_name = ? AND key = ?", (fn_name, key)
+            ).fetchone()
+        else:
+            row = self.get_connection().execute(
+                "SELECT value FROM cache WHERE fn_name = ? AND key = ? AND created_at >= ?", (fn_name, key, time() - ttl)
+            ).fetchone()
+        if row is None:
+            return False, None
+        return True, self.decode(row[0])
+
+    def iter_many(self, fn_name, keys):
+        connection = self.get_connection()
+        for batch in batched(keys):
+            values = dict(connection.execute(
+                f"SELECT key, value FROM cache WHERE fn_name = ? AND key IN ({','.join('?' * len(batch))})",
+                (fn_name, *batch),
+            ))
+            for key in batch:
+                yield self.decode(values[key]) if key in values else None
+
+    def put(self, fn_name, key, value):
+        self.put_many(fn_name, [(key, value)])
+
+    def put_many(self, fn_name, entries):
+        now = time()
+        rows = [(fn_name, key, self.encode(value), now) for key, value in entries]
+        connection = self.get_connection()
+        connection.execute("BEGIN")
+        try:
+            connection.executemany(
+                "INSERT OR REPLACE INTO cache (fn_name, key, value, created_at) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            connection.execute("COMMIT")
+        except:
+            connection.execute("ROLLBACK")
+            raise
+
+    def remove(self, fn_name, key):
+        self.remove_many(fn_name, [key])
+
+    def remove_many(self, fn_name, keys):
+        connection = self.get_connection()
+        for batch in batched(keys):
+            connection.execute(
+                f"DELETE FROM cache WHERE fn_name = ? AND key IN ({','.join('?' * len(batch))})",
+                (fn_name, *batch),
+            )
+
+    def keys(self, fn_name):
+        rows = self.get_connection().execute("SELECT key FROM cache WHERE fn_name = ?", (fn_name,))
+        return [row[0] for row in rows]
+
+    def existing_keys(self, fn_name, keys):
+        connection = self.get_connection()
+        result = set()
+        for batch in batched(list(keys)):
+            rows = connection.execute(
+                f"SELECT key FROM cache WHERE fn_name = ? AND key IN ({','.join('?' * len(batch))})",
+                (fn_name, *batch),
+            )
+            result.update(row[0] for row in rows)
+        return result
+
+    def fn_names(self):
+        return [row[0] for row in self.get_connection().execute("SELECT DISTINCT fn_name FROM cache")]
+
+    def entries(self, fn_name):
+        rows = self.get_connection().execute(
+            "SELECT key, created_at, COALESCE(accessed_at, created_at), hits, length(value) FROM cache WHERE fn_name = ?",
+            (fn_name,),
+        )
+        return [CacheEntry(*row) for row in rows]
+
+    def record_access(self, fn_name, accesses):
+        rows = [(accessed_at, hits, fn_name, key) for key, (accessed_at, hits) in accesses.items()]
+        connection = self.get_connection()
+        connection.execute("BEGIN")
+        try:
+            connection.executemany(
+                "UPDATE cache SET accessed_at = MAX(COALESCE(accessed_at, 0), ?), hits = hits + ? WHERE fn_name = ? AND key = ?",
+                rows,
+            )
+            connection.execute("COMMIT")
+        except:
+            connection.execute("ROLLBACK")
+            raise
+
+    def clear(self, fn_name=None):
+        if fn_name is not None:
+            self.get_connection().execute("DELETE FROM cache WHERE fn_name = ?", (fn_name,))
+        else:
+            self.get_connection().execute("DELETE FROM cache")
+
+
+def migrate_file_cache_to_sqlite(sqlite_backend=None, fn_names=None, delete_files=False, batch_size=SQLITE_BATCH_SIZE):
+    """
+    Copies the results of the cache/<fn_name>/<key>.json files into the sqlite backend.
+
+    :param sqlite_backend: The backend to migrate into, defaults to cache/cache.db.
+    :param fn_names: Names of the functions to migrate, defaults to all of them.
+    :param delete_files: Whether to delete the files of every migrated function.
+    :param batch_size: Number of results written per transaction.
+    :return: Number of migrated results.
+    """
+    sqlite_backend = sqlite_backend or SqliteCacheBackend()
+    file_backend = FileCacheBackend()
+    fn_names = file_backend.fn_names() if fn_names is None else fn_names
+
+    migrated = 0
+    for fn_name in fn_names:
+        keys = [key for key in file_backend.keys(fn_name) if key]
+        for batch in batched(keys, batch_size):
+            values = file_backend.read_chunk(fn_name, batch)
+            sqlite_backend.put_many(fn_name, list(zip(batch, values)))
+            migrated += len(batch)
+
+        print(f"Migrated {len(keys)} cached results of {fn_name}")
+
+        if delete_files:
+            file_backend.clear(fn_name)
+
+    return migrated
+
+
+if __name__ == "__main__":
+    import sys
+    # python -m botasaurus.cache_backends [--delete-files]
+    create_cache_directory_if_not_exists()
+    count = migrate_file_cache_to_sqlite(delete_files="--delete-files" in sys.argv)
+    print(f"Migrated {count} cached results to cache/cache.db")
@@ -0,0 +1,83 @@
+import gzip
+import zlib
+from json.decoder import JSONDecodeError
+from .json_codec import dumps_bytes, loads
+
+JSON = "json"
+GZIP = "gzip"
+ZSTD = "zstd"
+MSGPACK = "msgpack"
+
+CODECS = [JSON, GZIP, ZSTD, MSGPACK]
+
+# File extension of the cache files written with each codec
+EXTENSIONS = {
+    JSON: ".json",
+    GZIP: ".json.gz",
+    ZSTD: ".json.zst",
+    MSGPACK: ".msgpack",
+}
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+# msgpack has no magic number of its own, and JSON text never starts with a null byte
+MSGPACK_MAGIC = b"\x00msgpack"
+
+# Raised when reading a cache entry that was only partly written
+DECODE_ERRORS = (JSONDecodeError, UnicodeDecodeError, EOFError, gzip.BadGzipFile, zlib.error, ValueError)
+
+
+def _import_zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError('The zstd cache codec needs the zstandard package, install it by running "python -m pip install zstandard"')
+    return zstandard
+
+
+def _import_msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        raise ImportError('The msgpack cache codec needs the msgpack package, install it by running "python -m pip install msgpack"')
+    return msgpack
+
+
+def dumps_compact(value):
+    return dumps_bytes(value)
+
+
+def encode(value, codec=JSON, indent=4):
+    """
+    Encodes a cache value to bytes.
+
+    :param value: The JSON serializable value to encode.
+    :param codec: One of JSON, GZIP, ZSTD or MSGPACK.
+    :param indent: Indent of the JSON codec, the compressed codecs always write compact JSON.
+    :return: The encoded bytes, which decode() reads back whatever the codec.
+    """
+    if codec == JSON:
+        return dumps_bytes(value, indent)
+    if codec == GZIP:
+        # mtime=0 keeps the output the same for the same value
+        return gzip.compress(dumps_compact(value), compresslevel=6, mtime=0)
+    if codec == ZSTD:
+        return _import_zstd().ZstdCompressor(level=3).compress(dumps_compact(value))
+    if codec == MSGPACK:
+        return MSGPACK_MAGIC + _import_msgpack().packb(value, use_bin_type=True)
+    raise ValueError(f"Unknown cache codec {codec}, use one of {CODECS}")
+
+
+def decode(data):
+    """
+    Decodes bytes written by encode() with any codec, by looking at their magic number.
+    """
+    if isinstance(data, str):
+        return loads(data)
+    if data.startswith(GZIP_MAGIC):
+        return loads(gzip.decompress(data))
+    if data.startswith(ZSTD_MAGIC):
+        return loads(_import_zstd().ZstdDecompressor().decompress(data))
+    if data.startswith(MSGPACK_MAGIC):
+        return _import_msgpack().unpackb(data[len(MSGPACK_MAGIC):], raw=False)
+    return loads(data)
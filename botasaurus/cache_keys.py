@@ -0,0 +1,59 @@
+import json
+from hashlib import md5, sha1
+
+# Digits floats are rounded to, so that values like 0.1 + 0.2 and 0.3 get the same key
+FLOAT_DIGITS = 9
+
+_encoder = json.JSONEncoder(sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+# Values which serialize the same however they were created
+_PLAIN_TYPES = {str, int, bool, type(None)}
+
+
+def normalize(data):
+    """
+    Returns data with the dict keys as strings, tuples as lists and floats rounded,
+    with integral floats as ints, so that equal inputs get the same key.
+    """
+    if isinstance(data, float):
+        data = round(data, FLOAT_DIGITS)
+        # 1.0 and 1 are the same key, and so are -0.0 and 0
+        return int(data) if data.is_integer() else data
+    if isinstance(data, dict):
+        # Most inputs are flat dicts, which are already normal
+        if all(type(key) is str for key in data) and all(type(value) in _PLAIN_TYPES for value in data.values()):
+            return data
+        return {str(key): normalize(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [normalize(value) for value in data]
+    return data
+
+
+def canonical_key(data, ignored_fields=None):
+    """
+    Serializes data to bytes which are the same for equal inputs, whatever the order of their dict keys.
+
+    :param data: The JSON serializable input of the cached function.
+    :param ignored_fields: Keys to leave out when data is a dict, for inputs which don't change the result.
+    """
+    # Most inputs are links, which need no normalization
+    if isinstance(data, str):
+        return b"s" + data.encode("utf-8")
+
+    if ignored_fields and isinstance(data, dict):
+        data = {key: value for key, value in data.items() if key not in ignored_fields}
+    return b"j" + _encoder.encode(normalize(data)).encode("utf-8")
+
+
+def hash_key(data, ignored_fields=None):
+    # sha1 is hardware accelerated on most CPUs, and its 40 characters tell the keys apart from the older md5 keys
+    return sha1(canonical_key(data, ignored_fields)).hexdigest()
+
+
+def legacy_hash_key(data):
+    """The key the cache used before canonical keys, kept to find results cached back then."""
+    return md5(json.dumps(data).encode('utf-8')).hexdigest()
+
+
+def is_legacy_key(key):
+    return len(key) == 32
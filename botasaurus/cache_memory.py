@@ -0,0 +1,74 @@
+import marshal
+from collections import OrderedDict
+from threading import Lock
+
+# Default maximum size of the values kept in memory
+DEFAULT_MEMORY_LIMIT = 64 * 1024 * 1024
+
+
+class MemoryCache:
+    """
+    Bounded LRU of cached values kept in memory.
+
+    Values are kept marshalled, so every get returns a fresh copy which callers can modify,
+    and loading them is several times faster than parsing JSON.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MEMORY_LIMIT):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.items = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key):
+        """Returns a (found, value) tuple."""
+        with self.lock:
+            data = self.items.get(key)
+            if data is None:
+                return False, None
+            self.items.move_to_end(key)
+        return True, marshal.loads(data)
+
+    def put(self, key, value):
+        if not self.max_bytes:
+            return
+        try:
+            data = marshal.dumps(value)
+        except ValueError:
+            # Not a plain JSON like value
+            return
+        if len(data) > self.max_bytes:
+            return
+
+        with self.lock:
+            previous = self.items.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self.items[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self.items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def remove(self, key):
+        with self.lock:
+            previous = self.items.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+
+    def clear(self, fn_name=None):
+        """Removes the values of fn_name, or all values. The keys are (fn_name, key) tuples."""
+        with self.lock:
+            if fn_name is None:
+                self.items.clear()
+                self.size = 0
+                return
+            for key in [key for key in self.items if key[0] == fn_name]:
+                self.size -= len(self.items.pop(key))
+
+    def set_limit(self, max_bytes):
+        with self.lock:
+            self.max_bytes = max_bytes
+            while self.items and self.size > max_bytes:
+                _, evicted = self.items.popitem(last=False)
+                self.size -= len(evicted)
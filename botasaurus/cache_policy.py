@@ -0,0 +1,58 @@
+from collections import namedtuple
+from time import time
+
+LRU = "LRU"
+LFU = "LFU"
+
+# size is in bytes, the times are unix timestamps
+CacheEntry = namedtuple("CacheEntry", ["key", "created_at", "accessed_at", "hits", "size"])
+
+
+def is_expired(created_at, ttl, now=None):
+    return ttl is not None and (now or time()) - created_at > ttl
+
+
+class CachePolicy:
+    """
+    Limits how long and how many results of a function are kept in the cache.
+
+    :param ttl: Seconds after which a cached result expires, None to never expire.
+    :param max_entries: Maximum number of cached results, None for no limit.
+    :param max_bytes: Maximum total size of the cached results, None for no limit.
+    :param eviction: LRU to evict the least recently used results first, LFU to evict the least frequently used ones first.
+    """
+
+    def __init__(self, ttl=None, max_entries=None, max_bytes=None, eviction=LRU):
+        if eviction not in [LRU, LFU]:
+            raise ValueError(f"Unknown eviction {eviction}, use one of {[LRU, LFU]}")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.eviction = eviction
+
+    def select_expired(self, entries, now=None):
+        now = now or time()
+        return [entry for entry in entries if is_expired(entry.created_at, self.ttl, now)]
+
+    def select_evicted(self, entries):
+        """
+        Returns the entries to remove to get within max_entries and max_bytes, expired entries must already be removed.
+        """
+        excess_entries = len(entries) - self.max_entries if self.max_entries is not None else 0
+        excess_bytes = sum(entry.size for entry in entries) - self.max_bytes if self.max_bytes is not None else 0
+        if excess_entries <= 0 and excess_bytes <= 0:
+            return []
+
+        if self.eviction == LFU:
+            ordered = sorted(entries, key=lambda entry: (entry.hits, entry.accessed_at))
+        else:
+            ordered = sorted(entries, key=lambda entry: entry.accessed_at)
+
+        evicted = []
+        for entry in ordered:
+            if excess_entries <= 0 and excess_bytes <= 0:
+                break
+            evicted.append(entry)
+            excess_entries -= 1
+            excess_bytes -= entry.size
+        return evicted
@@ -22,9 +22,7 @@ from .output import write_json, write_csv, fix_csv_filename, fix_json_filename
 from .cache import (
     Cache,
     is_dont_cache,
-    _get,
-    _has,
-    _get_cache_path,
+    _get_cached,
     _create_cache_directory_if_not_exists,
 )
 
@@ -131,6 +129,53 @@ class AsyncQueueResult:
         return flatten(self.result_list)
 
 
+def create_streaming_worker(task_queue: Queue, result_list, orginal_data, run_item, number_of_workers, on_done):
+    """
+    Creates the worker of an AsyncQueueResult which hands the items of every put() one by one
+    to a persistent pool of threads, so the pool keeps running while new items are being put.
+    Results are kept in the order the items were put.
+    """
+    item_queue = Queue()
+
+    def _pool_worker():
+        while True:
+            task = item_queue.get()
+            if task is None:
+                break
+
+            index, item, kwargs = task
+            result_list[index] = run_item(item, kwargs)
+
+    def _worker():
+        pool = [Thread(target=_pool_worker, daemon=True) for _ in range(number_of_workers)]
+        for thread in pool:
+            thread.start()
+
+        while True:
+            task = task_queue.get()
+
+            if task is None:
+                for _ in pool:
+                    item_queue.put(None)
+                for thread in pool:
+                    thread.join()
+
+                on_done()
+                task_queue.task_done()
+                break
+
+            args, kwargs = task
+            items = args[0] if isinstance(args[0], list) else [args[0]]
+            for item in items:
+                orginal_data.append(item)
+                result_list.append(None)
+                item_queue.put((len(result_list) - 1, item, kwargs))
+
+            task_queue.task_done()
+
+    return _worker
+
+
 class ThreadWithResult(Thread):
     def __init__(
         self, group=None, target=None, name=None, args=(), kwargs={}, *, daemon=None
@@ -433,9 +478,9 @@ def browser(
 
             def run_task(data, is_retry, retry_attempt, retry_driver=None) -> Any:
                 if cache is True:
-                    path = _get_cache_path(func, data)
-                    if _has(path):
-                        return _get(path)
+                    is_cached, cached_result = _get_cached(func, data)
+                    if is_cached:
+                        return cached_result
 
                 evaluated_window_size = (
                     window_size(data) if callable(window_size) else window_size
@@ -825,6 +870,9 @@ def request(
 
             raise_exception = kwargs.get("raise_exception", raise_exception)
 
+            # Read from kwargs directly, as concurrent callers may each pass their own metadata
+            call_metadata = kwargs["metadata"] if "metadata" in kwargs else metadata
+
             fn_name = func.__name__
             if cache:
                 _create_cache_directory_if_not_exists(func)
@@ -835,9 +883,9 @@ def request(
                 retry_attempt,
             ) -> Any:
                 if cache is True:
-                    path = _get_cache_path(func, data)
-                    if _has(path):
-                        return _get(path)
+                    is_cached, cached_result = _get_cached(func, data)
+                    if is_cached:
+                        return cached_result
                 evaluated_proxy = proxy(data) if callable(proxy) else proxy
                 evaluated_user_agent = (
                     user_agent(data) if callable(user_agent) else user_agent
@@ -848,8 +896,8 @@ def request(
 
                 result = None
                 try:
-                    if "metadata" in kwargs or metadata is not None:
-                        result = func(reqs, data, metadata)
+                    if "metadata" in kwargs or call_metadata is not None:
+                        result = func(reqs, data, call_metadata)
                     else:
                         result = func(reqs, data)
                     if cache is True or cache == Cache.REFRESH :
@@ -992,20 +1040,23 @@ def request(
                 result_list = []
                 orginal_data = []
 
+                def on_done():
+                    Usage.put(func.__name__, None)
+                    # Thread Finished
+                    write_output(
+                        output,
+                        output_formats,
+                        orginal_data,
+                        flatten(result_list),
+                        func.__name__,
+                    )
+
                 def _worker():
                     while True:
                         task = task_queue.get()
 
                         if task is None:
-                            Usage.put(func.__name__, None)
-                            # Thread Finished
-                            write_output(
-                                output,
-                                output_formats,
-                                orginal_data,
-                                flatten(result_list),
-                                func.__name__,
-                            )
+                            on_done()
                             task_queue.task_done()
                             break
 
@@ -1029,6 +1080,20 @@ def request(
 
                         task_queue.task_done()
 
+                def run_item(item, kwargs):
+                    merged_kwargs = {
+                        **wrapper_kwargs,
+                        **kwargs,
+                    }  # Merge wrapper_kwargs with kwargs
+                    return wrapper_requests(item, **merged_kwargs)
+
+                number_of_workers = wrapper_kwargs.get("parallel", parallel)
+                number_of_workers = number_of_workers() if callable(number_of_workers) else number_of_workers
+
+                # With parallel, stream items to a pool of workers instead of waiting for each put() batch to finish.
+                if number_of_workers is not None and number_of_workers > 1:
+                    _worker = create_streaming_worker(task_queue, result_list, orginal_data, run_item, number_of_workers, on_done)
+
                 worker_thread = Thread(target=_worker, daemon=True)
 
                 worker_thread.start()
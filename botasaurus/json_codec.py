@@ -0,0 +1,99 @@
+import json
+
+STDLIB = "json"
+ORJSON = "orjson"
+
+
+class StdlibJsonCodec:
+    """Encodes JSON with the json module of the standard library."""
+
+    name = STDLIB
+
+    def dumps(self, value, indent=None):
+        if indent is None:
+            return json.dumps(value, separators=(",", ":")).encode("utf-8")
+        return json.dumps(value, indent=indent).encode("utf-8")
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class OrjsonJsonCodec:
+    """
+    Encodes compact JSON and decodes JSON with orjson, which is several times faster than the json module.
+
+    Indented JSON, like bt.write_json and the JSON output, is written for people to read, so it is encoded
+    by the json module, which indents by 4 spaces and escapes non ASCII characters, the same with either codec.
+    Compact values orjson can't handle, like integers over 64 bits, are encoded by the json module too.
+    """
+
+    name = ORJSON
+
+    def __init__(self):
+        import orjson
+        self.orjson = orjson
+
+    def dumps(self, value, indent=None):
+        if indent is not None:
+            return StdlibJsonCodec.dumps(self, value, indent)
+        try:
+            return self.orjson.dumps(value, option=self.orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            return StdlibJsonCodec.dumps(self, value)
+
+    def loads(self, data):
+        try:
+            return self.orjson.loads(data)
+        except self.orjson.JSONDecodeError:
+            # The json module also accepts NaN, Infinity and lone surrogates
+            return json.loads(data)
+
+
+def create_codec(name):
+    if name == ORJSON:
+        try:
+            return OrjsonJsonCodec()
+        except ImportError:
+            raise ImportError('The orjson JSON codec needs the orjson package, install it by running "python -m pip install orjson"')
+    if name == STDLIB:
+        return StdlibJsonCodec()
+    raise ValueError(f"Unknown JSON codec {name}, use one of {[STDLIB, ORJSON]}")
+
+
+def create_default_codec():
+    try:
+        return OrjsonJsonCodec()
+    except ImportError:
+        return StdlibJsonCodec()
+
+
+_codec = create_default_codec()
+
+
+def set_json_codec(codec):
+    """
+    Sets the codec every JSON file, cache entry and storage is encoded with.
+
+    :param codec: STDLIB, ORJSON, or an object with dumps(value, indent) returning bytes and loads(data) methods.
+    The default is ORJSON when orjson is installed, and STDLIB otherwise.
+    """
+    global _codec
+    _codec = create_codec(codec) if isinstance(codec, str) else codec
+
+
+def get_json_codec():
+    return _codec
+
+
+def dumps_bytes(value, indent=None):
+    """Encodes value to UTF-8 JSON bytes, compact when indent is None."""
+    return _codec.dumps(value, indent)
+
+
+def dumps(value, indent=None):
+    return _codec.dumps(value, indent).decode("utf-8")
+
+
+def loads(data):
+    """Decodes JSON from str or bytes."""
+    return _codec.loads(data)
@@ -42,7 +42,7 @@ def file_exists(filename):
         except FileNotFoundError:
             return False
 
-def write_json(data, filename, log = True):
+def write_json(data, filename, log = True, indent = 4):
         # if type(data) is list and len(data) == 0:
         #     # if log:
         #     print("No JSON File written as data list is empty.")
@@ -57,13 +57,14 @@ def write_json(data, filename, log = True):
             if not filename.endswith(".json"):
                 filename = filename + ".json"
 
-            _write_json(data, filename)
+            # indent=None writes compact JSON, which is smaller and faster to write
+            _write_json(data, filename, indent)
 
             if log:
                 print(f"View written JSON file at {filename}")        
         except PermissionError:
             prompt(f"{filename} is currently open in another application. Please close the the Application and press 'Enter' to save.")
-            write_json(data, filename, log)
+            write_json(data, filename, log, indent)
 
 def write_temp_json(data, log = True):
         filename = 'temp'
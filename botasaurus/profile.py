@@ -1,9 +1,8 @@
 from datetime import datetime
-import json
 import os
 import random as random_module
 
-from .utils import datetime_to_str, relative_path, str_to_datetime
+from .utils import datetime_to_str, read_json, relative_path, str_to_datetime, write_json
 
 class ProfilePyStorageException(Exception):
     pass
@@ -35,12 +34,10 @@ class JSONStorageBackend(BasicStorageBackend):
         if not os.path.isfile(self.json_path):
             self.commit_to_disk()
 
-        with open(self.json_path, "r") as json_file:
-            self.json_data = json.load(json_file)
+        self.json_data = read_json(self.json_path)
         
     def commit_to_disk(self):
-        with open(self.json_path, "w") as json_file:
-            json.dump(self.json_data, json_file, indent=4)
+        write_json(self.json_data, self.json_path)
 
     def get_item(self, key: str, default = None) -> str:
         if key in self.json_data:
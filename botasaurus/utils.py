@@ -8,6 +8,7 @@ from time import sleep
 from urllib.error import ContentTooShortError, URLError
 from sys import platform, exit
 from .list_utils import flatten_depth
+from .json_codec import dumps_bytes, loads
 
 def is_errors_instance(instances, error):
     for i in range(len(instances)):
@@ -257,8 +258,8 @@ def write_file( data, path,):
 
 
 def read_json(path):
-    with open(path, 'r', encoding="utf-8") as fp:
-        data = json.load(fp)
+    with open(path, 'rb') as fp:
+        data = loads(fp.read())
         return data
 
 def read_file(path):
@@ -267,8 +268,9 @@ def read_file(path):
         return content
         
 def write_json(data, path,  indent=4):
-    with open(path, 'w', encoding="utf-8") as fp:
-        json.dump(data, fp, indent=indent)
+    # indent=None writes compact JSON
+    with open(path, 'wb') as fp:
+        fp.write(dumps_bytes(data, indent))
 
 
 def get_driver_path():
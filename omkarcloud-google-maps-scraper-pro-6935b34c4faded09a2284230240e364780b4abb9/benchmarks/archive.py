@@ -0,0 +1,62 @@
+# python -m benchmarks.archive
+import json
+import os
+import random
+import tempfile
+from time import perf_counter
+from src.archive import StateArchive, extract_archived_batch
+from src.extract_data import EXTRACTORS, extract_data, get_initialization_state
+from src.process_pool import determine_processes, map_in_processes
+from .initialization_state import create_page
+from .place_paths import create_place_data
+
+
+def create_state(i):
+    # A state of the size of a page's, holding a place with values at the paths extract_data reads
+    state = json.loads(get_initialization_state(create_page(i)))
+    state[3][6] = ")]}'\n" + json.dumps(create_place_data(0.75), separators=(",", ":"))
+    return json.dumps(state, separators=(",", ":"))
+
+
+def determine_extractable_fields(states):
+    # The values of the synthetic places are text, which the fields reading nested values can't extract
+    fields = []
+    for field in EXTRACTORS:
+        try:
+            for state in states:
+                extract_data(state, "link", (field,))
+            fields.append(field)
+        except Exception:
+            pass
+    return tuple(fields)
+
+
+def run(n=200, distinct=20):
+    random.seed(0)
+    # Creating the pages takes longer than extracting them, so the states repeat under distinct links
+    states = [create_state(i) for i in range(distinct)]
+    fields = determine_extractable_fields(states)
+    state_size = sum(len(state) for state in states) / distinct / 1_000_000
+
+    with tempfile.TemporaryDirectory() as directory:
+        archive = StateArchive(os.path.join(directory, "archive.db"))
+        start = perf_counter()
+        for i in range(n):
+            # A changed place, as the same state is stored once
+            archive.put(f"https://www.google.com/maps/place/{i}", states[i % distinct] + " " * (i // distinct))
+        put_time = (perf_counter() - start) / n
+        archive_size = os.path.getsize(os.path.join(directory, "archive.db")) / n / 1_000_000
+        print(f"archive {n} states of {state_size:.1f} MB: {put_time * 1000:.1f} ms per place, {archive_size:.2f} MB per place on disk")
+
+        for processes in sorted({1, determine_processes(None)}):
+            batches = ((link_states, fields, True) for link_states in archive.iter_compressed_batches())
+            start = perf_counter()
+            extracted = sum(len(places) for places, failed_links in map_in_processes(extract_archived_batch, batches, processes))
+            duration = perf_counter() - start
+            assert extracted == n, "Failed to extract places"
+            print(f"extract {n} archived places, {len(fields)} of {len(EXTRACTORS)} fields, with {processes} processes: {duration / n * 1000:.1f} ms per place, {n / duration * 3600 / 1_000_000:.1f}M places per hour")
+        archive.close()
+
+
+if __name__ == "__main__":
+    run()
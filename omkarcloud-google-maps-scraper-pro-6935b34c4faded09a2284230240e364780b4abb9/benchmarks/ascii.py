@@ -0,0 +1,28 @@
+# python -m benchmarks.ascii
+import copy
+from unidecode import unidecode
+from src.utils import applyTransformer, convert_unicode_dict_to_ascii_dict
+from .places import create_places, timeit
+
+
+def unicode_to_ascii_uncached(text):
+    # unicode_to_ascii before the ASCII fast path and cache, kept as the baseline.
+    if text is None:
+        return None
+    return unidecode(text).replace("ë", "e")
+
+
+def convert_unicode_dict_to_ascii_dict_uncached(data):
+    return applyTransformer(data, unicode_to_ascii_uncached)
+
+
+def run(n=5_000):
+    places = create_places(n, edge_cases=True)
+    baseline, expected = timeit(convert_unicode_dict_to_ascii_dict_uncached, places)
+    optimized, result = timeit(convert_unicode_dict_to_ascii_dict, copy.deepcopy(places))
+    assert result == expected, "Different ASCII conversion"
+    print(f"{n} places: uncached {baseline:.3f}s, cached in place {optimized:.3f}s ({baseline / optimized:.1f}x)")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,103 @@
+# python -m benchmarks.cache_bulk
+import gc
+import os
+import random
+import tempfile
+from time import perf_counter
+from joblib import Parallel, delayed
+from botasaurus.cache import Cache
+from botasaurus.cache_backends import FileCacheBackend, read_cache_file
+from .places import create_text
+
+
+def scrape_reviews(data):
+    pass
+
+
+def create_reviews(n):
+    random.seed(0)
+    return [
+        {
+            "review_id": f"review-{i}",
+            "rating": random.randint(1, 5),
+            "review_text": create_text(30),
+            "published_at": "2 months ago",
+            "review_likes_count": random.randint(0, 20),
+        }
+        for i in range(n)
+    ]
+
+
+def get_paths(keys):
+    backend = FileCacheBackend()
+    return [backend.get_path(scrape_reviews.__name__, key) for key in keys]
+
+
+def read_with_processes():
+    # Cache.get_items before the thread pool, kept as the baseline.
+    keys = FileCacheBackend().keys(scrape_reviews.__name__)
+    return Parallel(n_jobs=-1)(delayed(read_cache_file)(path) for path in get_paths(keys))
+
+
+def remove_file(backend, key):
+    path = backend.find_path(scrape_reviews.__name__, key)
+    while path is not None:
+        os.remove(path)
+        path = backend.find_path(scrape_reviews.__name__, key)
+
+
+def delete_with_processes(keys):
+    # Cache.remove_items before the thread pool, kept as the baseline.
+    backend = FileCacheBackend()
+    Parallel(n_jobs=-1)(delayed(remove_file)(backend, key) for key in keys)
+
+
+def count_streamed(items):
+    return sum(1 for _ in Cache.iter_items(scrape_reviews, items))
+
+
+def best_of(fn, *args, repeats=3):
+    # The runs allocate a lot, so collect the garbage of each before timing the next
+    durations = []
+    for _ in range(repeats):
+        gc.collect()
+        start = perf_counter()
+        fn(*args)
+        durations.append(perf_counter() - start)
+    return min(durations)
+
+
+def sort_reviews(reviews):
+    return sorted(reviews, key=lambda review: review["review_id"])
+
+
+def run(n=100_000):
+    reviews = create_reviews(n)
+    links = [f"https://www.google.com/maps/place/place-{i}" for i in range(n)]
+    cwd = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            Cache.set_backend(Cache.FILE)
+            Cache.put_items(scrape_reviews, links, reviews)
+            assert sort_reviews(Cache.get_items(scrape_reviews)) == sort_reviews(reviews), "Different cached reviews"
+            assert sum(1 for _ in Cache.iter_items(scrape_reviews, links)) == n
+            del reviews
+
+            processes = best_of(read_with_processes)
+            threads = best_of(Cache.get_items, scrape_reviews)
+            streamed = best_of(count_streamed, None)
+            print(f"read {n} entries: processes {processes:.2f}s, threads {threads:.2f}s ({processes / threads:.1f}x), streamed {streamed:.2f}s")
+
+            keys = Cache.get_items_hashes(scrape_reviews)
+            half = n // 2
+            processes = best_of(delete_with_processes, keys[:half], repeats=1)
+            threads = best_of(Cache.remove_items, scrape_reviews, links[half:], repeats=1)
+            print(f"delete {half} entries: processes {processes:.2f}s, threads {threads:.2f}s ({processes / threads:.1f}x)")
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,65 @@
+# python -m benchmarks.cache_codec
+import json
+import os
+import tempfile
+from time import perf_counter
+from botasaurus.cache_backends import FileCacheBackend, SqliteCacheBackend
+from botasaurus.cache_codecs import CODECS, JSON
+from .places import create_places
+
+
+def get_size(directory):
+    return sum(os.path.getsize(os.path.join(root, file)) for root, _, files in os.walk(directory) for file in files)
+
+
+def run_backend(backend, places):
+    fn_name = "scrape_place"
+    keys = [place["place_id"] for place in places]
+    backend.setup(fn_name)
+
+    start = perf_counter()
+    for key, place in zip(keys, places):
+        backend.put(fn_name, key, place)
+    write_time = perf_counter() - start
+
+    start = perf_counter()
+    result = [backend.get(fn_name, key)[1] for key in keys]
+    read_time = perf_counter() - start
+
+    assert result == places, "Cached places changed"
+    return write_time, read_time
+
+
+def run(n=2_000):
+    places = create_places(n)
+    megabytes = len(json.dumps(places)) / 1_000_000
+    cwd = os.getcwd()
+
+    for backend_class in [FileCacheBackend, SqliteCacheBackend]:
+        base_size = None
+        for codec in CODECS:
+            with tempfile.TemporaryDirectory() as directory:
+                os.chdir(directory)
+                try:
+                    backend = backend_class(codec=codec)
+                    try:
+                        write_time, read_time = run_backend(backend, places)
+                    except ImportError:
+                        print(f"{backend_class.__name__}, {codec}: skipped, not installed")
+                        continue
+                    if isinstance(backend, SqliteCacheBackend):
+                        backend.close()
+                    size = get_size("cache")
+                finally:
+                    os.chdir(cwd)
+
+            if codec == JSON:
+                base_size = size
+            print(
+                f"{backend_class.__name__}, {codec}: {size / 1_000_000:.1f} MB ({base_size / size:.1f}x smaller), "
+                f"write {megabytes / write_time:.0f} MB/s, read {megabytes / read_time:.0f} MB/s"
+            )
+
+
+if __name__ == "__main__":
+    run()
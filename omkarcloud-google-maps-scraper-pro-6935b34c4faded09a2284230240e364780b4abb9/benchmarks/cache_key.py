@@ -0,0 +1,34 @@
+# python -m benchmarks.cache_key
+import json
+from hashlib import md5
+from botasaurus.cache_keys import hash_key
+from src.gmaps import create_place_data, create_reviews_data
+from .places import create_places, timeit_each
+
+
+def legacy_hash_key(data):
+    # The key of the cache before canonical keys, kept as the baseline.
+    return md5(json.dumps(data).encode('utf-8')).hexdigest()
+
+
+def run(n=10_000, repeats=10):
+    places = create_places(n)
+    inputs = {
+        "place links": [place["link"] for place in places],
+        "place data": [create_place_data(f"restaurants in city {i}", False, None, "en", None, None, True) for i in range(n)],
+        "reviews data": create_reviews_data(places, 20, "newest", True, "en"),
+    }
+
+    for name, items in inputs.items():
+        baseline = timeit_each(legacy_hash_key, items, repeats)
+        canonical = timeit_each(hash_key, items, repeats)
+        print(f"{len(items) * repeats} {name} keys: md5 of json {baseline:.3f}s, canonical {canonical:.3f}s ({baseline / canonical:.1f}x)")
+
+    # Inputs with another key order, or floats for ints, now share the key
+    data = create_place_data("restaurants", False, 20, "en", None, 14, True)
+    reordered = dict(reversed(list(data.items())), zoom=14.0)
+    assert hash_key(data) == hash_key(reordered) and legacy_hash_key(data) != legacy_hash_key(reordered)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,49 @@
+# python -m benchmarks.cache_lookup
+import os
+import tempfile
+from botasaurus.cache import Cache, _get_cached, _hash
+from botasaurus.cache_backends import FileCacheBackend
+from .places import create_places, timeit
+
+
+def scrape_place(link):
+    pass
+
+
+def get_from_disk(backend, links):
+    # The lookup of the decorators before the memory tier and key index, kept as the baseline.
+    return [backend.get(scrape_place.__name__, _hash(link)) for link in links]
+
+
+def get_from_cache(links):
+    # The lookup of the decorators
+    return [_get_cached(scrape_place, link) for link in links]
+
+
+def run(n=1_000, repeats=5):
+    places = create_places(n)
+    links = [place["link"] for place in places]
+    # Half the lookups are misses, and the cached places repeat as in a city sweep
+    lookups = (links + [link + "-missing" for link in links]) * repeats
+    cwd = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            Cache.set_backend(Cache.FILE)
+            Cache.put_items(scrape_place, links, places)
+
+            sample = lookups[:100] + lookups[n:n + 100]
+            expected = [value for _, value in get_from_disk(FileCacheBackend(), sample)]
+            assert [value for _, value in get_from_cache(sample)] == expected, "Different cached places"
+
+            baseline = timeit(get_from_disk, FileCacheBackend(), lookups)[0]
+            optimized = timeit(get_from_cache, lookups)[0]
+            print(f"{len(lookups)} lookups of {n} places: disk {baseline:.3f}s, memory and index {optimized:.3f}s ({baseline / optimized:.1f}x)")
+            print(Cache.stats(scrape_place))
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,46 @@
+# python -m benchmarks.extraction_pool
+import random
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter, sleep
+from src.extract_data import extract_data
+from src.process_pool import determine_processes, run_in_shared_pool
+from .archive import create_state, determine_extractable_fields
+
+
+def run_threads(extract, states, fields, threads, fetch_time):
+    def scrape_place(i):
+        # The request, which waits on the network without holding the GIL, then the extraction
+        sleep(fetch_time)
+        return extract(extract_data, states[i % len(states)], f"https://www.google.com/maps/place/{i}", fields)
+
+    start = perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        places = list(executor.map(scrape_place, range(len(states) * 10)))
+    return places, perf_counter() - start
+
+
+def in_thread(fn, *args):
+    # How scrape_place extracted before
+    return fn(*args)
+
+
+def run(distinct=20, fetch_time=0.01):
+    random.seed(0)
+    states = [create_state(i) for i in range(distinct)]
+    fields = determine_extractable_fields(states)
+    n = distinct * 10
+    print(f"{determine_processes(None)} cores, {n} synthetic places, {fetch_time * 1000:.0f} ms per request")
+
+    # Warm the processes up, as they start with the first places of a run
+    run_threads(run_in_shared_pool, states, fields, 5, 0)
+    # 5 threads a browser, like scrape_place
+    for browsers in [1, 4]:
+        threads = 5 * browsers
+        thread_places, thread_time = run_threads(in_thread, states, fields, threads, fetch_time)
+        pool_places, pool_time = run_threads(run_in_shared_pool, states, fields, threads, fetch_time)
+        assert pool_places == thread_places, "Different places"
+        print(f"{threads} threads: in thread {n / thread_time:.0f} places/s, in processes {n / pool_time:.0f} places/s ({thread_time / pool_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    run()
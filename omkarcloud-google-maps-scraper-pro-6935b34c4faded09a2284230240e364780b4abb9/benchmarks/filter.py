@@ -0,0 +1,69 @@
+# python -m benchmarks.filter
+from src.sort_filter import filter_places
+from src.utils import kebab_case, unicode_to_ascii
+from .places import create_places, timeit
+
+
+def list_contains_string(string_list, target_string):
+    target_string_lower = kebab_case(unicode_to_ascii(target_string)).lower()
+    for item in string_list:
+        if target_string_lower == kebab_case(unicode_to_ascii(item)).lower():
+            return True
+    return False
+
+
+def filter_places_uncompiled(ls, filter_data):
+    # filter_places before the compiled predicates, kept as the baseline.
+    def fn(i):
+        min_rating = filter_data.get("min_rating")
+        min_reviews = filter_data.get("min_reviews")
+        has_website = filter_data.get("has_website")
+        category_in = filter_data.get("category_in")
+
+        rating = i.get('rating')
+        reviews = i.get('reviews')
+        web_site = i.get("website")
+        main_category = i.get("main_category")
+
+        if category_in :
+            if not main_category:
+                return False
+
+            if (not list_contains_string(category_in, main_category)):
+                return False
+
+        if min_rating is not None and (rating == '' or rating is None or rating < min_rating):
+            return False
+
+        if min_reviews is not None and (reviews == '' or reviews is None or reviews < min_reviews):
+            return False
+
+        if has_website is not None:
+            if (has_website is False and web_site is not None):
+                return False
+
+            if (has_website is True and web_site is None):
+                return False
+
+        return True
+
+    return list(filter(fn, ls))
+
+
+def run(n=10_000):
+    places = create_places(n, edge_cases=True)
+    filters = {
+        "category": {"category_in": ["cafe", "Pizza Restaurant", "web-designer", "Hotel"]},
+        "category, rating, website": {"category_in": ["Restaurant", "Bakerei"], "min_rating": 4, "has_website": True},
+        "reviews": {"min_reviews": 1},
+    }
+
+    for name, filter_data in filters.items():
+        baseline, expected = timeit(filter_places_uncompiled, places, filter_data)
+        compiled, result = timeit(filter_places, places, filter_data)
+        assert result == expected, f"Different places for {name} filter"
+        print(f"{n} places, {name} filter: uncompiled {baseline:.3f}s, compiled {compiled:.3f}s ({baseline / compiled:.1f}x)")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,96 @@
+# python -m benchmarks.initialization_state
+import gc
+import json
+import random
+import tracemalloc
+from time import process_time
+from botasaurus.json_codec import ORJSON, STDLIB, get_json_codec, loads, set_json_codec
+from src.extract_data import get_initialization_state, parse
+from .places import create_place, create_text
+
+
+def to_array(value):
+    # Google sends places as sparse nested arrays rather than objects
+    if isinstance(value, dict):
+        return [to_array(item) for item in value.values()] + [None] * random.randint(0, 20)
+    if isinstance(value, list):
+        return [to_array(item) for item in value]
+    return value
+
+
+def create_page(i, place_size=40, page_size=1_500_000):
+    """
+    Creates a place page shaped like the ones scrape_place fetches: scripts and styles around a
+    window.APP_INITIALIZATION_STATE holding the place as a )]}' prefixed JSON string at [3][6].
+    """
+    place = [None] * 6 + [to_array(create_place(i * place_size + j)) for j in range(place_size)]
+    state = [
+        [[to_array(create_place(i)) for _ in range(5)], [random.uniform(-90, 90), random.uniform(-180, 180)], 1024, 768],
+        None,
+        [[create_text(10), None, [1, 2, 3]] for _ in range(200)],
+        [None, "en", "US", None, None, None, ")]}'\n" + json.dumps(place, separators=(",", ":")), None],
+        [[create_text(20), random.random()] for _ in range(500)],
+    ]
+    script = f"<script nonce=\"{random.getrandbits(64):x}\">var _pageData=\"{create_text(30)}\";function f(a,b){{return a[b]}}</script>\n"
+    wrapper = script * (page_size // len(script) // 2)
+    return (
+        "<!DOCTYPE html><html><head>" + wrapper + "<script>window.APP_OPTIONS=[];"
+        + ";window.APP_INITIALIZATION_STATE=" + json.dumps(state, separators=(",", ":"))
+        + ";window.APP_FLAGS=[1,0,1];window.VERSION_INFO=[];</script></head><body>" + wrapper + "</body></html>"
+    )
+
+
+def parse_with_split(html):
+    # How scrape_place and parse read the state before
+    initialization_state_part = html.split(';window.APP_INITIALIZATION_STATE=')[1]
+    app_initialization_state = initialization_state_part.split(';window.APP_FLAGS')[0]
+    input_string = loads(app_initialization_state)[3][6]
+    return loads(input_string[len(")]}'"):])
+
+
+def parse_with_offsets(html):
+    return parse(get_initialization_state(html))
+
+
+def measure(fn, pages):
+    gc.collect()
+    start = process_time()
+    for html in pages:
+        fn(html)
+    duration = process_time() - start
+
+    peaks = []
+    for html in pages:
+        tracemalloc.start()
+        fn(html)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return duration / len(pages), sum(peaks) / len(peaks)
+
+
+def run(n=20):
+    random.seed(0)
+    pages = [create_page(i) for i in range(n)]
+    state_size = sum(len(get_initialization_state(html)) for html in pages) / n / 1_000_000
+    page_size = sum(len(html) for html in pages) / n / 1_000_000
+    print(f"{n} synthetic place pages of {page_size:.1f} MB, with states of {state_size:.1f} MB")
+
+    default_codec = get_json_codec()
+    for codec in [STDLIB, ORJSON]:
+        try:
+            set_json_codec(codec)
+        except ImportError:
+            print(f"{codec}: skipped, not installed")
+            continue
+        for html in pages:
+            assert parse_with_offsets(html) == parse_with_split(html), "Different places"
+
+        results = {name: measure(fn, pages) for name, fn in [("split", parse_with_split), ("offsets", parse_with_offsets)]}
+        split_time, split_peak = results["split"]
+        for name, (duration, peak) in results.items():
+            print(f"{codec} {name}: {duration * 1000:.1f} ms CPU per place ({split_time / duration:.2f}x), peak {peak / 1_000_000:.1f} MB per place ({split_peak / peak:.1f}x less)")
+    set_json_codec(default_codec)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,33 @@
+# python -m benchmarks.json_codec
+from botasaurus.json_codec import ORJSON, STDLIB, create_codec
+from .places import create_places, timeit_each
+
+
+def run(n=1_000, repeats=5):
+    places = create_places(n)
+    codecs = {STDLIB: create_codec(STDLIB)}
+    try:
+        codecs[ORJSON] = create_codec(ORJSON)
+    except ImportError:
+        print(f"{ORJSON}: skipped, not installed")
+
+    # Like the Cache and the places of the JSON Lines output, as indented JSON is encoded by the json module with either codec
+    cases = {
+        "encode compact": lambda codec: (lambda place: codec.dumps(place)),
+    }
+    encoded = [codecs[STDLIB].dumps(place) for place in places]
+    megabytes = sum(len(data) for data in encoded) * repeats / 1_000_000
+
+    for name, create_fn in cases.items():
+        times = {codec_name: timeit_each(create_fn(codec), places, repeats) for codec_name, codec in codecs.items()}
+        print(f"{name} {n * repeats} places: " + ", ".join(f"{codec_name} {megabytes / duration:.0f} MB/s ({times[STDLIB] / duration:.1f}x)" for codec_name, duration in times.items()))
+
+    times = {}
+    for codec_name, codec in codecs.items():
+        assert [codec.loads(data) for data in encoded] == places, "Different decoded places"
+        times[codec_name] = timeit_each(codec.loads, encoded, repeats)
+    print(f"decode {n * repeats} places: " + ", ".join(f"{codec_name} {megabytes / duration:.0f} MB/s ({times[STDLIB] / duration:.1f}x)" for codec_name, duration in times.items()))
+
+
+if __name__ == "__main__":
+    run()
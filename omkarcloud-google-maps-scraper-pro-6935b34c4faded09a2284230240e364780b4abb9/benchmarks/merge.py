@@ -0,0 +1,60 @@
+# python -m benchmarks.merge
+from src.gmaps import get_empty_data, merge_reviews, merge_social
+from .places import create_places, timeit
+
+
+def merge_social_linear(places, social_details):
+    # merge_social before the place_id index, kept as the baseline.
+    for place in places:
+        found_social_detail = next((detail for detail in social_details if detail['place_id'] == place['place_id']), None)
+        if found_social_detail:
+            place.update(found_social_detail['data'])
+        else:
+            place.update(get_empty_data())
+    return places
+
+
+def merge_reviews_linear(places, reviews):
+    # merge_reviews before the place_id index, kept as the baseline.
+    for place in places:
+        found_review = next((review for review in reviews if review['place_id'] == place['place_id']), None)
+        place['detailed_reviews'] = found_review['reviews'] if found_review else []
+    return places
+
+
+def create_social_details(places):
+    # Every other place has a website, so only half of them have social details.
+    return [{"place_id": place["place_id"], "data": {"emails": [f"info@place-{i}.com"]}} for i, place in enumerate(places[::2])]
+
+
+def create_reviews(places):
+    return [{"place_id": place["place_id"], "reviews": [{"rating": 5}]} for place in places[::2]]
+
+
+def copy_places(places):
+    # The merges update the places, so every merge gets its own copies
+    return [dict(place) for place in places]
+
+
+# The linear merges are quadratic, so they only run up to this size.
+MAX_LINEAR_SIZE = 10_000
+
+def run(sizes=(1_000, 10_000, 30_000)):
+    all_places = create_places(max(sizes))
+    for n in sizes:
+        places = all_places[:n]
+        social_details = create_social_details(places)
+        reviews = create_reviews(places)
+
+        indexed = timeit(merge_social, copy_places(places), social_details)[0] + timeit(merge_reviews, copy_places(places), reviews)[0]
+        print(f"{n:>7} places: indexed merge {indexed:.3f}s", end="")
+
+        if n <= MAX_LINEAR_SIZE:
+            linear = timeit(merge_social_linear, copy_places(places), social_details)[0] + timeit(merge_reviews_linear, copy_places(places), reviews)[0]
+            print(f", linear merge {linear:.3f}s ({linear / indexed:.0f}x)")
+        else:
+            print(", linear merge skipped")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,80 @@
+# python -m benchmarks.output_parquet, needs pyarrow
+import csv
+import json
+import os
+import random
+import tempfile
+from time import perf_counter
+from src.output_sinks import CsvSink, ParquetSink, import_pyarrow
+from .places import create_text, timeit
+
+
+def create_review(i):
+    return {
+        "place_id": f"ChIJ{i // 50:024x}",
+        "place_name": f"Place {i // 50}",
+        "review_id_hash": f"{random.getrandbits(128):032x}",
+        "rating": random.randint(1, 5),
+        "review_text": create_text(40),
+        "published_at": "2 months ago",
+        "published_at_date": "2024-01-15 10:30:00",
+        "response_from_owner_text": create_text(15) if random.random() < 0.3 else None,
+        "review_likes_count": random.randint(0, 20),
+        "total_number_of_reviews_by_reviewer": random.randint(1, 300),
+        "is_local_guide": random.random() < 0.4,
+        "review_photos": [f"https://lh5.googleusercontent.com/p/AF1Qip{random.getrandbits(64):016x}" for _ in range(random.randint(0, 3))],
+    }
+
+
+def write(sink, rows):
+    start = perf_counter()
+    for row in rows:
+        sink.write(row)
+    sink.close()
+    return perf_counter() - start
+
+
+def read_csv(path):
+    # Reading the reviews back as they were, the nested review photos were stringified as JSON
+    with open(path, newline="", encoding="utf-8") as fp:
+        rows = list(csv.DictReader(fp))
+    for row in rows:
+        row["rating"] = int(row["rating"])
+        row["review_photos"] = json.loads(row["review_photos"])
+    return rows
+
+
+def read_parquet(path):
+    return import_pyarrow().parquet.read_table(path)
+
+
+def run(n=500_000):
+    random.seed(0)
+    reviews = [create_review(i) for i in range(n)]
+    cwd = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            csv_write = write(CsvSink("reviews.csv"), reviews)
+            parquet_write = write(ParquetSink("reviews.parquet"), reviews)
+
+            csv_read, csv_rows = timeit(read_csv, "reviews.csv")
+            del csv_rows
+            parquet_read, table = timeit(read_parquet, "reviews.parquet")
+            assert table.slice(0, 1000).to_pylist() == reviews[:1000], "Different reviews"
+            del table
+
+            csv_size = os.path.getsize("reviews.csv") / 1_000_000
+            parquet_size = os.path.getsize("reviews.parquet") / 1_000_000
+        finally:
+            os.chdir(cwd)
+
+    print(f"{n} detailed reviews")
+    print(f"size: csv {csv_size:.1f} MB, parquet {parquet_size:.1f} MB ({csv_size / parquet_size:.1f}x smaller)")
+    print(f"write: csv {csv_write:.2f}s, parquet {parquet_write:.2f}s")
+    print(f"read: csv {csv_read:.2f}s, parquet {parquet_read:.2f}s ({csv_read / parquet_read:.1f}x)")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,116 @@
+import gc
+import random
+from time import perf_counter
+
+CATEGORIES = ["Restaurant", "Pizza restaurant", "Cafe", "Web designer", "Marketing agency", "Dentist", "Bakery", "Hotel"]
+NON_ASCII_CATEGORIES = ["Café", "Pâtisserie", "Bäckerei", "Ресторан", "レストラン"]
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+WORDS = "great food friendly staff service clean fast price value parking quiet cozy place visit again recommend".split()
+
+
+def create_text(words):
+    return " ".join(random.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def create_place(i, edge_cases=False):
+    """
+    Creates a place shaped like a scrape_place result, with images, competitors, popular times and featured reviews.
+
+    With edge_cases, some of the fields the filters and sorts read are missing, the place has social details,
+    and some of its text is not ASCII, like the places of searches in other countries.
+    """
+    place_id = f"ChIJ{random.getrandbits(96):024x}"
+    name = f"Place {i}"
+    place = {
+        "place_id": place_id,
+        "name": name,
+        "description": create_text(20),
+        "reviews": random.randint(0, 5000),
+        "competitors": [
+            {"name": f"Competitor {i}-{j}", "link": f"https://www.google.com/maps/place/competitor-{i}-{j}", "reviews": random.randint(0, 500), "rating": round(random.uniform(1, 5), 1), "main_category": random.choice(CATEGORIES)}
+            for j in range(5)
+        ],
+        "website": f"https://place-{i}.com",
+        "can_claim": random.random() < 0.2,
+        "owner": {"id": str(random.getrandbits(64)), "name": name, "link": f"https://www.google.com/maps/contrib/{random.getrandbits(64)}"},
+        "featured_image": f"https://lh5.googleusercontent.com/p/AF1Qip{random.getrandbits(128):032x}=w1080-h1080-k-no",
+        "main_category": random.choice(CATEGORIES),
+        "categories": random.sample(CATEGORIES, 3),
+        "rating": round(random.uniform(1, 5), 1),
+        "workday_timing": "9 am-6 pm",
+        "closed_on": ["Sunday"],
+        "phone": f"+1 555-{random.randint(100, 999)}-{random.randint(1000, 9999)}",
+        "address": f"{random.randint(1, 999)} Main St, Springfield, IL 62701",
+        "review_keywords": [{"keyword": random.choice(WORDS), "count": random.randint(1, 99)} for _ in range(10)],
+        "link": f"https://www.google.com/maps/place/place-{i}/data=!4m7!3m6!1s0x{random.getrandbits(64):016x}",
+        "status": "Open",
+        "price_range": "$$",
+        "reviews_per_rating": {str(rating): random.randint(0, 1000) for rating in range(1, 6)},
+        "featured_question": {"question": create_text(10), "answer": create_text(15), "question_date": "a year ago", "answer_date": "a year ago", "question_likes_count": 3, "answer_likes_count": 1},
+        "reviews_link": f"https://search.google.com/local/reviews?placeid={place_id}&q={name}&authuser=0&hl=en&gl=US",
+        "coordinates": {"latitude": random.uniform(-90, 90), "longitude": random.uniform(-180, 180)},
+        "plus_code": "8FVC9G8F+6X",
+        "detailed_address": {"ward": "Downtown", "street": "Main St", "city": "Springfield", "postal_code": "62701", "state": "Illinois", "country_code": "US"},
+        "time_zone": "America/Chicago",
+        "cid": str(random.getrandbits(64)),
+        "data_id": f"0x{random.getrandbits(64):016x}:0x{random.getrandbits(64):016x}",
+        "menu": {"link": f"https://place-{i}.com/menu", "source": "place.com"},
+        "reservations": [],
+        "order_online_links": [{"link": f"https://order.example.com/place-{i}", "source": "example.com"}],
+        "about": [{"id": "service_options", "name": "Service options", "options": [{"name": option, "enabled": random.random() < 0.5} for option in ["Dine-in", "Takeout", "Delivery"]]}],
+        "images": [{"about": "All", "link": f"https://lh5.googleusercontent.com/p/AF1Qip{random.getrandbits(128):032x}=w1080-h1080-k-no"} for _ in range(12)],
+        "hours": [{"day": day, "times": ["9 am-6 pm"]} for day in DAYS],
+        "most_popular_times": [{"hour_of_day": 12, "average_popularity": 80, "time_label": "12 pm"}],
+        "popular_times": [
+            {"day": day, "popular_times": [{"hour_of_day": hour, "popularity": random.randint(0, 100), "time_label": f"{hour % 12 or 12} {'am' if hour < 12 else 'pm'}"} for hour in range(6, 24)]}
+            for day in DAYS
+        ],
+        "featured_reviews": [
+            {"review_id": f"ChdDSUhN{random.getrandbits(64):016x}", "review_link": f"https://www.google.com/maps/reviews/data={random.getrandbits(64):016x}", "name": f"Reviewer {j}", "rating": random.randint(1, 5), "review_text": create_text(40), "published_at": "2 months ago", "review_photos": []}
+            for j in range(8)
+        ],
+    }
+    if edge_cases:
+        add_edge_cases(place, i)
+    return place
+
+
+def add_edge_cases(place, i):
+    for field in ["reviews", "rating", "website", "main_category"]:
+        if random.random() < 0.3:
+            place[field] = None
+    place["linkedin"] = random.choice([None, f"https://linkedin.com/company/place-{i}"])
+    place["is_spending_on_ads"] = random.random() < 0.05
+
+    if random.random() < 0.5:
+        place["name"] = f"Café Müller {i}"
+        place["address"] = f"Königstraße {i}, 70173 Stuttgart"
+    place["categories"] = random.sample(CATEGORIES + NON_ASCII_CATEGORIES, 3)
+    if place["main_category"] is not None:
+        place["main_category"] = place["categories"][0]
+    for review in place["featured_reviews"]:
+        review["name"] = random.choice([review["name"], "Zoë", "Jürgen"])
+        review["review_text"] += " The crème brûlée is the best in town."
+
+
+def create_places(n, seed=0, edge_cases=False):
+    random.seed(seed)
+    return [create_place(i, edge_cases) for i in range(n)]
+
+
+def timeit(fn, *args):
+    """Returns how long fn(*args) took in seconds, along with its result."""
+    # Don't let the garbage of the previous run slow this one down
+    gc.collect()
+    start = perf_counter()
+    result = fn(*args)
+    return perf_counter() - start, result
+
+
+def timeit_each(fn, inputs, repeats, clock=perf_counter):
+    """Returns how long calling fn on every input, repeats times, took in seconds."""
+    start = clock()
+    for _ in range(repeats):
+        for data in inputs:
+            fn(data)
+    return clock() - start
@@ -0,0 +1,233 @@
+# python -m benchmarks.review_pages
+import random
+from time import process_time
+from bs4 import BeautifulSoup, Tag
+from lxml import html
+import regex as re
+from src.reviews_scraper import GoogleMapsAPIScraper, extract_google_maps_contributor_url, extract_reviews_and_photos, review_default_result
+from .places import create_text, timeit_each
+
+
+def create_review_text(translated):
+    # The text, with a span Google adds after it, and sometimes entities, comments and line breaks
+    text = create_text(random.randint(2, 12)).replace(".", random.choice([".", ". &amp; ", ".<br>", ".<!-- c -->", ". <b>really</b>"]))
+    full_text = f'<span class="review-full-text" style="display:none">{text}<span class="review-snippet">More</span></span>'
+    if translated:
+        full_text += f'<span class="review-full-text">{create_text(3)}<div class="k8MTF">(Original)</div></span>'
+    return f'<span data-expandable-section="" tabindex="-1">{create_text(2)}</span>{full_text}' if random.random() < 0.8 else f'<span data-expandable-section="">{text}</span>'
+
+
+def create_review(i, edge_cases):
+    """Creates a review shaped like the ones of Google's reviewSort responses."""
+    review_id = f"ChZDSUhNMG9nS0VJQ0FnSUM{i:06d}"
+    local_guide = '<span class="QV3IV">Local Guide</span> · ' if random.random() < 0.3 else ""
+    user_text = local_guide + f"{random.randint(1, 1500):,} reviews" + (f" · {random.randint(1, 3000):,} photos" if random.random() < 0.6 else "")
+    rating = random.randint(1, 5)
+    parts = [
+        f'<div class="gws-localreviews__google-review WMbnJf" data-ri="{i}">',
+        f'<div class="jxjCjc"><a class="Msppse" href="https://www.google.com/maps/contrib/{random.getrandbits(60)}?hl=en">',
+        f'<div class="TSUbDb"><a>{create_text(1)}</a></div><div class="A503be">{user_text}</div></a></div>',
+        f'<div class="PuaHbe"><span class="lTi8oc z3HNkc" aria-label="Rated {rating}.0 out of 5,"></span>',
+        f'<span class="dehysf lTi8oc">{random.randint(2, 11)} months ago</span></div>',
+        '<div class="Jtu6Td">' + create_review_text(random.random() < 0.2) + '</div>',
+    ]
+    if random.random() < 0.3:
+        parts.append(f'<div class="PV7e7"><span>Trip type</span> <span>{random.choice(["Vacation", "Business"])}</span></div>')
+    if random.random() < 0.4:
+        parts.append(f'<div class="k8MTF"><span>Food: {rating}</span> <span>Service: {rating}</span></div>')
+    parts.append(f'<a class="RvU3D" href="https://www.google.com/maps/reviews/data=!4m8!14m7!1m6!2m5!1s{review_id}?postId={review_id}&amp;hl=en"></a>')
+    if random.random() < 0.5:
+        parts.append(f'<span jsname="CMh1ye">{random.randint(1, 40)}</span>')
+    if random.random() < 0.3:
+        # The response of the owner, along with its translation, as a response without one goes through the error handler
+        parts.append(f'<div class="lcorif"><span class="pi8uOe">{random.randint(1, 11)} months ago</span>')
+        parts.append(f'<div class="d6SCIc">{create_text(3)}<span class="review-snippet">More</span></div><div class="d6SCIc">{create_text(2)}</div></div>')
+    if edge_cases:
+        # Missing fields, a response without a translation, and strings BeautifulSoup leaves out of the text
+        parts = [part for part in parts if random.random() < 0.9 or "gws-localreviews" in part]
+        parts.append(random.choice([
+            f'<div class="lcorif"><span class="pi8uOe">a week ago<script>var a = 1;</script></span><div class="d6SCIc">{create_text(1)}</div></div>',
+            '<template><span class="PV7e7">Trip type <b>Business</b></span></template>',
+            '<style>.TSUbDb{color:red}</style><span jsname="CMh1ye"><!-- 3 -->7</span>',
+            '<ruby class="k8MTF">漢<rp>(</rp><rt>kan</rt><rp>)</rp></ruby>',
+            '<span class="review-full-text  ">Spaced <i class="">classes</i>\t</span>',
+        ]))
+    parts.append('</div>')
+    return "\n".join(parts)
+
+
+def create_page(page, n=10, edge_cases=False):
+    """Creates a review page, as _cut_response_text leaves a reviewSort response, with n reviews."""
+    reviews = "\n".join(create_review(page * n + i, edge_cases) for i in range(n))
+    return (
+        '<html><body><div class="lcorif" data-google-review-count="1234" data-next-page-token="CAESY0NBRVFDaH">'
+        f'<div class="gws-localreviews__general-reviews-block">{reviews}</div></div></body></html>'
+    )
+
+
+class SoupScraper(GoogleMapsAPIScraper):
+    """How the review pages were parsed before, with BeautifulSoup."""
+
+    def _format_response_text(self, response_text):
+        response_soup = reviews_soup = review_count = next_token = None
+        try:
+            response_soup = BeautifulSoup(response_text, "lxml")
+            tree = html.document_fromstring(response_text)
+            metadata_node = tree.xpath("//*[@data-google-review-count]")[0]
+            review_count = int(metadata_node.attrib["data-google-review-count"])
+            next_token = metadata_node.attrib["data-next-page-token"]
+            reviews_soup = response_soup.find_all(True, class_="gws-localreviews__google-review")
+        except Exception:
+            if next_token is None:
+                next_token = self._get_response_token(response_text)
+        return response_text, response_soup, reviews_soup, review_count, next_token
+
+    def _parse_review_text(self, text_block):
+        text = ""
+        for e, s in zip(text_block.contents, text_block.stripped_strings):
+            if isinstance(e, Tag) and e.has_attr("class"):
+                break
+            text += s + " "
+        text = re.sub(r"\s", " ", text)
+        text = re.sub("'|\"", "", text)
+        return text.strip()
+
+    def _handle_review_exception(self, result, review, name):
+        result["errors"].append(name)
+        return result
+
+    def _parse_review(self, review, hl):
+        result = review_default_result.copy()
+        try:
+            text_block = review.find(True, class_="review-full-text")
+            if not text_block:
+                text_block = review.find(True, {"data-expandable-section": True})
+            if text_block:
+                result["text"] = self._parse_review_text(text_block)
+        except Exception:
+            self._handle_review_exception(result, review, "text")
+        try:
+            translated_text = review.find_all(True, class_="review-full-text")
+            if not translated_text:
+                translated_text = review.find_all(True, {"data-expandable-section": True})
+            if len(translated_text) > 1:
+                result["translated_text"] = self._parse_review_text(translated_text[1])
+        except Exception:
+            self._handle_review_exception(result, review, "translated_text")
+        try:
+            rating_text = review.find(True, class_="lTi8oc z3HNkc").get("aria-label")
+            rating_text = re.sub(",", ".", rating_text)
+            rating = re.findall("[0-9]+[.][0-9]*", rating_text)
+            result["rating"] = float(rating[0])
+            result["rating_max"] = None
+        except Exception:
+            self._handle_review_exception(result, review, "rating")
+        try:
+            other_ratings = review.find(True, class_="k8MTF")
+            if other_ratings:
+                s = " ".join([s for s in other_ratings.stripped_strings])
+                result["other_ratings"] = re.sub(r"\s+", " ", s)
+        except Exception:
+            self._handle_review_exception(result, review, "other_ratings")
+        try:
+            result["relative_date"] = review.find(True, class_="dehysf lTi8oc").text
+        except Exception:
+            self._handle_review_exception(result, review, "relative_date")
+        try:
+            result["user_name"] = review.find(True, class_="TSUbDb").text
+        except Exception:
+            self._handle_review_exception(result, review, "user_name")
+        try:
+            user_node = review.find(True, class_="Msppse")
+            if user_node:
+                result["user_url"] = user_node.get("href")
+                result["user_is_local_guide"] = True if user_node.find(True, class_="QV3IV") else False
+                fixed_text = user_node.text.replace(",", "").replace(".", "")
+                result["user_reviews"], result["user_photos"] = extract_reviews_and_photos(fixed_text)
+        except Exception:
+            self._handle_review_exception(result, review, "user_data")
+        try:
+            review_id = review.find(True, class_="RvU3D").get("href")
+            result["review_id"] = re.findall("(?<=postId=).*?(?=&)", review_id)[0]
+        except Exception:
+            self._handle_review_exception(result, review, "review_id")
+        try:
+            review_likes = review.find(True, jsname="CMh1ye")
+            if review_likes:
+                result["likes"] = int(review_likes.text)
+        except Exception:
+            self._handle_review_exception(result, review, "likes")
+        try:
+            response = review.find(True, class_="d6SCIc")
+            if response:
+                result["response_text"] = self._parse_review_text(response)
+            response_date = review.find(True, class_="pi8uOe")
+            if response_date:
+                result["response_relative_date"] = response_date.text
+        except Exception:
+            self._handle_review_exception(result, review, "response")
+        try:
+            response = review.find_all(True, class_="d6SCIc")
+            if response:
+                result["translated_response_text"] = self._parse_review_text(response[1])
+        except Exception:
+            self._handle_review_exception(result, review, "response")
+        try:
+            trip_type_travel_group = review.find(True, class_="PV7e7")
+            if trip_type_travel_group:
+                s = " ".join([s for s in trip_type_travel_group.stripped_strings])
+                result["trip_type_travel_group"] = re.sub(r"\s+", " ", s)
+        except Exception:
+            self._handle_review_exception(result, review, "trip_type_travel_group")
+
+        if result["user_url"]:
+            result["user_url"] = extract_google_maps_contributor_url(result["user_url"])
+        for key in ["translated_text", "translated_response_text", "user_reviews", "user_photos"]:
+            if not result[key]:
+                result[key] = None
+        return result
+
+
+class LxmlScraper(GoogleMapsAPIScraper):
+    def _handle_review_exception(self, result, review, name):
+        # Like SoupScraper, the errors are compared by the fields they happened in, without writing them to files
+        result["errors"].append(name)
+        return result
+
+
+def parse_page(scraper, page):
+    _, _, reviews, review_count, next_token = scraper._format_response_text(page)
+    results = []
+    for review in reviews:
+        # A list of its own, as the default result shares its list of errors between reviews
+        review_default_result["errors"] = []
+        result = scraper._parse_review(review, "es")
+        del result["retrieval_date"]
+        results.append(result)
+    return results, review_count, next_token
+
+
+def time_per_page(scraper, pages, repeats):
+    return timeit_each(lambda page: parse_page(scraper, page), pages, repeats, process_time) / (len(pages) * repeats)
+
+
+def run(n=100, repeats=3):
+    random.seed(0)
+    soup_scraper, lxml_scraper = SoupScraper(), LxmlScraper()
+    edge_case_pages = [create_page(page, edge_cases=True) for page in range(200)]
+    for page in edge_case_pages:
+        assert parse_page(lxml_scraper, page) == parse_page(soup_scraper, page), "Different reviews"
+
+    pages = [create_page(page) for page in range(n)]
+    for page in pages:
+        assert parse_page(lxml_scraper, page) == parse_page(soup_scraper, page), "Different reviews"
+    review_default_result["errors"] = []
+
+    print(f"{n} synthetic review pages of 10 reviews, {sum(len(page) for page in pages) / n / 1000:.0f} KB each, the same reviews as BeautifulSoup on {len(edge_case_pages)} more with edge cases")
+    soup_time = time_per_page(soup_scraper, pages, repeats)
+    lxml_time = time_per_page(lxml_scraper, pages, repeats)
+    print(f"BeautifulSoup and lxml: {soup_time * 1000:.2f} ms CPU per page, lxml in one pass: {lxml_time * 1000:.2f} ms CPU per page ({soup_time / lxml_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,55 @@
+# python -m benchmarks.sort
+from src.gmaps import Gmaps
+from src.sort_filter import sort_places
+from .places import create_places, timeit
+
+
+def sort_place_per_criterion(places:list, sort):
+    # sort_place before the compiled sort plan, kept as the baseline.
+    def sorting_key(item):
+        value = item.get(sort[0])
+        if value is None:
+            return (0,)
+        return (1, value) if isinstance(value, int) else (2, value)
+
+    def sorting_bool_true(item):
+        result = item.get(sort[0], 0)
+        if result is True  or result is not None:
+            return 1
+        return 0
+
+    def sorting_bool_false(item):
+        result = item.get(sort[0], 0)
+        if result is False  or result is None:
+            return 1
+        return 0
+
+    sorting_order = sort[1]
+    if isinstance(sorting_order, bool):
+        return sorted(places, key=sorting_bool_false if sorting_order else sorting_bool_true)
+    return sorted(places, key=sorting_key, reverse=(sorting_order == "desc"))
+
+
+def sort_places_per_criterion(places:list, sorts):
+    for sort in sorts:
+        places = sort_place_per_criterion(places, sort)
+    return places
+
+
+def run(n=10_000):
+    places = create_places(n, edge_cases=True)
+    sorts = {
+        "default": Gmaps.DEFAULT_SORT,
+        "rating desc, name asc": [Gmaps.SORT_BY_RATING_DESCENDING, Gmaps.SORT_BY_NAME_ASCENDING],
+        "name desc": [[Gmaps.Fields.NAME, Gmaps.SORT_DESCENDING]],
+    }
+
+    for name, sort in sorts.items():
+        baseline, expected = timeit(sort_places_per_criterion, places, sort)
+        compiled, result = timeit(sort_places, places, sort)
+        assert result == expected, f"Different order for {name} sort"
+        print(f"{n} places, {name} sort: per criterion {baseline:.3f}s, compiled {compiled:.3f}s ({baseline / compiled:.1f}x)")
+
+
+if __name__ == "__main__":
+    run()
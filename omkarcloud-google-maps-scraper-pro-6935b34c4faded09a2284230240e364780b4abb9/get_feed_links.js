@@ -0,0 +1,25 @@
+function get_feed_links(selector, only_new) {
+  try {
+    const links = []
+
+    for (const link of document.querySelectorAll(selector)) {
+      // Skip the links returned by an earlier call, when only new links are asked for.
+      if (only_new) {
+        if (link.hasAttribute('data-feed-link-seen')) continue
+        link.setAttribute('data-feed-link-seen', '')
+      }
+
+      // Sponsored places have the "Sponsored" text in their parent <div>.
+      const div = link.closest('.Nv2PK')
+      const is_sponsored = div !== null && div.querySelector('.kpih0e.f8ia3c.uvopNe') !== null
+
+      links.push([link.href, is_sponsored])
+    }
+
+    return links
+  } catch (error) {
+    return []
+  }
+}
+
+return get_feed_links(arguments[0], arguments[1])
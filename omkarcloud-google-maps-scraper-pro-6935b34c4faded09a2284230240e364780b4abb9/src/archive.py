@@ -0,0 +1,182 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import zlib
+from time import time
+from botasaurus.decorators_utils import create_directory_if_not_exists
+from botasaurus.utils import relative_path
+from .extract_data import extract_data
+from .utils import convert_unicode_dict_to_ascii_dict
+
+ARCHIVE_PATH = 'archive/archive.db'
+
+# A state compresses about 6x at level 3 in about 8 ms, the higher levels shave off little more for twice the time
+COMPRESS_LEVEL = 3
+
+# Links read from the archive, and extracted by a process, at a time
+BATCH_SIZE = 50
+
+
+def compress_state(state):
+    return zlib.compress(state.encode('utf-8'), COMPRESS_LEVEL)
+
+
+def decompress_state(compressed):
+    return zlib.decompress(compressed).decode('utf-8')
+
+
+def hash_state(state):
+    return hashlib.sha1(state.encode('utf-8')).hexdigest()
+
+
+class StateArchive:
+    """
+    Keeps the raw APP_INITIALIZATION_STATE of every place fetched, compressed, in a sqlite database in WAL mode,
+    so that the places can be extracted again, after extract_data gains a field or Google changes the layout,
+    without fetching them again.
+
+    The states are content addressed by their hash, so fetching a place which has not changed again stores it once.
+    """
+
+    def __init__(self, path=ARCHIVE_PATH):
+        self.path = path
+        # sqlite connections can't be shared between threads, and places are fetched in many threads
+        self._local = threading.local()
+        # The connections of every thread, so that close() closes them all
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+    def get_connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            create_directory_if_not_exists(os.path.dirname(self.path) or '.')
+            # Each thread uses its own connection, but close() closes them from the thread calling it
+            connection = sqlite3.connect(relative_path(self.path), timeout=60, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS states (
+                    hash TEXT PRIMARY KEY,
+                    state BLOB NOT NULL
+                ) WITHOUT ROWID"""
+            )
+            # A rowid table, so that the places are read back in the order they were archived
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS places (
+                    link TEXT PRIMARY KEY,
+                    hash TEXT NOT NULL,
+                    archived_at REAL NOT NULL
+                )"""
+            )
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def put(self, link, state):
+        state_hash = hash_state(state)
+        connection = self.get_connection()
+        # Compressed outside the transaction, so that the other threads aren't kept waiting for it
+        compressed = None
+        if connection.execute("SELECT 1 FROM states WHERE hash = ?", (state_hash,)).fetchone() is None:
+            compressed = compress_state(state)
+
+        # Takes the write lock right away. A deferred transaction reading first would fail with
+        # "database is locked" when upgrading to a write while another thread writes, rather than wait.
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if compressed is not None:
+                connection.execute("INSERT OR IGNORE INTO states (hash, state) VALUES (?, ?)", (state_hash, compressed))
+            connection.execute(
+                "INSERT OR REPLACE INTO places (link, hash, archived_at) VALUES (?, ?, ?)", (link, state_hash, time())
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def get(self, link):
+        """Returns the state of the place at link, or None when it is not archived."""
+        row = self.get_connection().execute(
+            "SELECT states.state FROM places JOIN states ON places.hash = states.hash WHERE places.link = ?", (link,)
+        ).fetchone()
+        return None if row is None else decompress_state(row[0])
+
+    def count(self):
+        return self.get_connection().execute("SELECT COUNT(*) FROM places").fetchone()[0]
+
+    def iter_compressed_batches(self, links=None, batch_size=BATCH_SIZE):
+        """
+        Yields lists of (link, compressed state) tuples, of every archived place in the order they were archived,
+        or of the archived places at links in their order. The states are decompressed by whoever extracts them.
+        """
+        connection = self.get_connection()
+        if links is None:
+            cursor = connection.execute(
+                "SELECT places.link, states.state FROM places JOIN states ON places.hash = states.hash ORDER BY places.rowid"
+            )
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    return
+                yield batch
+
+        for start in range(0, len(links), batch_size):
+            batch_links = links[start:start + batch_size]
+            rows = connection.execute(
+                "SELECT places.link, states.state FROM places JOIN states ON places.hash = states.hash WHERE places.link IN ({})".format(
+                    ",".join("?" * len(batch_links))
+                ),
+                batch_links,
+            ).fetchall()
+            states = dict(rows)
+            batch = [(link, states[link]) for link in batch_links if link in states]
+            if batch:
+                yield batch
+
+    def close(self):
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        # Threads using the archive again open new connections
+        self._local = threading.local()
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_archive():
+    """Returns the StateArchive scrape_place archives to, shared by the threads fetching places."""
+    global _archive
+    if _archive is None:
+        with _archive_lock:
+            if _archive is None:
+                _archive = StateArchive()
+    return _archive
+
+
+def extract_archived_batch(batch):
+    """
+    Extracts the places of a batch of iter_compressed_batches, in a worker process.
+
+    Returns a (places, failed links) tuple, as a state whose layout extract_data can't read fails on its own.
+    """
+    link_states, fields, convert_to_english = batch
+    places = []
+    failed_links = []
+    for link, compressed in link_states:
+        try:
+            place = extract_data(decompress_state(compressed), link, fields)
+        except Exception:
+            failed_links.append(link)
+            continue
+        # Like scrape_place, ads are only known when searching
+        place['is_spending_on_ads'] = False
+        places.append(place)
+
+    if convert_to_english:
+        places = convert_unicode_dict_to_ascii_dict(places)
+    return places, failed_links
@@ -1,7 +1,11 @@
 import re as rex
-import json
+from botasaurus.json_codec import ORJSON, get_json_codec, loads
 from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+from json.decoder import JSONDecoder, scanstring
 from hashlib import md5
+from src.fields import Fields
 from src.scraper_utils import create_search_link
 from urllib.parse import urlparse, urlunparse
 # from botasaurus import bt
@@ -20,15 +24,15 @@ def extract_path_from_link(link):
         )
 
 
-def get_can_claim(data):
+def get_can_claim(values):
 
-    link = safe_get(data, 6, 226, 0)
+    link = values["claim_link"]
     if isinstance(link, str):
         path = extract_path_from_link(link)
         if path and path.rstrip("/").endswith("setup/create"):
             return True
 
-    text = safe_get(data, 6, 49, 1)
+    text = values["claim_text"]
     if isinstance(text, str) and (
         text.lower().startswith("claim") or " claim" in text.lower()
     ):
@@ -69,36 +73,150 @@ def safe_get(data, *keys):
     return data
 
 
-def get_categories(data):
-    return safe_get(data, 6, 13)
+# Where every value a place is extracted from is in its data. When Google moves a value, only its path changes here.
+PLACE_PATHS = {
+    "reviews_link": (6, 4, 3, 0),
+    "price_range": (6, 4, 2),
+    "rating": (6, 4, 7),
+    "reviews": (6, 4, 8),
+    "website": (6, 7, 0),
+    "latitude": (6, 9, 2),
+    "longitude": (6, 9, 3),
+    "data_id": (6, 10),
+    "title": (6, 11),
+    "categories": (6, 13),
+    "main_category": (6, 13, 0),
+    "address": (6, 18),
+    "time_zone": (6, 30),
+    "description": (6, 32, 1, 1),
+    "hours": (6, 34, 1),
+    "open_state": (6, 34, 4, 4),
+    "menu_link": (6, 38, 0),
+    "menu_source": (6, 38, 1),
+    "reservations": (6, 46),
+    "claim_text": (6, 49, 1),
+    "featured_reviews": (6, 52, 0),
+    "reviews_per_rating": (6, 52, 3),
+    "owner_name": (6, 57, 1),
+    "owner_id": (6, 57, 2),
+    "thumbnail": (6, 72, 0, 1, 6, 0),
+    "order_online_links": (6, 75, 0, 1, 2),
+    "order_online_links_fallback": (6, 75, 0, 0, 2),
+    "place_id": (6, 78),
+    "popular_times": (6, 84, 0),
+    "competitors": (6, 99, 0, 0, 1),
+    "about": (6, 100, 1),
+    "questions": (6, 126),
+    "review_keywords": (6, 153, 0),
+    "editorial_description": (6, 154, 0, 0),
+    "images": (6, 171, 0),
+    "phone": (6, 178, 0, 0),
+    "ward": (6, 183, 1, 0),
+    "street": (6, 183, 1, 1),
+    "city": (6, 183, 1, 3),
+    "postal_code": (6, 183, 1, 4),
+    "state": (6, 183, 1, 5),
+    "country_code": (6, 183, 1, 6),
+    "plus_code": (6, 183, 2, 2, 0),
+    "claim_link": (6, 226, 0),
+    "cid": (25, 3, 0, 13, 0, 0, 1),
+}
+
+
+def build_path_tree(paths):
+    """Returns the paths as a tree of {key: (names, children)}, in which paths sharing a prefix share its nodes."""
+    tree = {}
+    for name, path in paths.items():
+        children = tree
+        for depth, key in enumerate(path):
+            if not isinstance(key, int):
+                raise ValueError(f"The path of {name} has {key!r}, paths can only have list indexes")
+            names, children = children.setdefault(key, ([], {}))
+            if depth == len(path) - 1:
+                names.append(name)
+    return tree
+
+
+def walk_path_tree(data, tree, values):
+    # The data of a place are nested lists, this walks whatever else is found on a path the way safe_get does
+    for key, (names, children) in tree.items():
+        try:
+            value = data[key]
+        except (IndexError, TypeError, KeyError):
+            continue
+        for name in names:
+            values[name] = value
+        if children:
+            walk_path_tree(value, children, values)
+
+
+def compile_paths(paths):
+    """
+    Compiles a table of paths into a function returning the value at every path of the data,
+    or None where a path is missing, the same as safe_get(data, *path) for each of them.
+
+    The function is generated code walking the data once, visiting every shared prefix once,
+    with a bounds check per list instead of a try/except per key, so missing values cost no exception.
+    """
+    lines = ["def resolve(node0):", "    values = EMPTY_VALUES.copy()"]
+    subtrees = []
+
+    def add_node(tree, depth, indent):
+        node, size, pad = f"node{depth}", f"size{depth}", "    " * indent
+        lines.append(f"{pad}if type({node}) is list:")
+        lines.append(f"{pad}    {size} = len({node})")
+        for key, (names, children) in tree.items():
+            lines.append(f"{pad}    if {size} > {key}:" if key >= 0 else f"{pad}    if {size} >= {-key}:")
+            lines.append(f"{pad}        node{depth + 1} = {node}[{key}]")
+            for name in names:
+                lines.append(f"{pad}        values[{name!r}] = node{depth + 1}")
+            if children:
+                add_node(children, depth + 1, indent + 2)
+        subtrees.append(tree)
+        lines.append(f"{pad}elif {node} is not None:")
+        lines.append(f"{pad}    walk_path_tree({node}, SUBTREES[{len(subtrees) - 1}], values)")
+
+    add_node(build_path_tree(paths), 0, 1)
+    lines.append("    return values")
+
+    namespace = {"EMPTY_VALUES": dict.fromkeys(paths), "SUBTREES": subtrees, "walk_path_tree": walk_path_tree}
+    exec(compile("\n".join(lines), "<compiled paths>", "exec"), namespace)
+    return namespace["resolve"]
+
+
+resolve_place_paths = compile_paths(PLACE_PATHS)
+
+
+def get_categories(values):
+    return values["categories"]
 
 
-def get_thumbnail(data):
-    return safe_get(data, 6, 72, 0, 1, 6, 0)
+def get_thumbnail(values):
+    return values["thumbnail"]
 
 
-def get_place_id(data):
-    return safe_get(data, 6, 78)
+def get_place_id(values):
+    return values["place_id"]
 
 
-def get_description(data):
-    return safe_get(data, 6, 32, 1, 1) or safe_get(data, 6, 154, 0, 0)
+def get_description(values):
+    return values["description"] or values["editorial_description"]
 
 
-def get_open_state(data):
-    return safe_get(data, 6, 34, 4, 4)
+def get_open_state(values):
+    return values["open_state"]
 
 
-def get_plus_code(data):
-    return safe_get(data, 6, 183, 2, 2, 0)
+def get_plus_code(values):
+    return values["plus_code"]
 
 
-def get_gps_coordinates(data):
-    return {"latitude": safe_get(data, 6, 9, 2), "longitude": safe_get(data, 6, 9, 3)}
+def get_gps_coordinates(values):
+    return {"latitude": values["latitude"], "longitude": values["longitude"]}
 
 
-def get_images(data):
-    images = safe_get(data, 6, 171, 0) or []
+def get_images(values):
+    images = values["images"] or []
     ls = []
     for element in images:
         title = element[2]
@@ -108,8 +226,8 @@ def get_images(data):
     return ls
 
 
-def extract_questions(data):
-    images = safe_get(data, 6, 126) or []
+def extract_questions(values):
+    images = values["questions"] or []
     ls = []
     for element in images:
         question_data = safe_get(element, 0, 0)
@@ -152,7 +270,7 @@ def extract_questions(data):
                 "link": answered_by_link,
             }
         else:
-            ownerd = get_owner(data)
+            ownerd = get_owner(values)
             answered_by = {
                 "name": ownerd.get("name", None),
                 "link": ownerd.get("link", None),
@@ -196,8 +314,8 @@ def competitor_sorting_key(item):
     return (1, value) if isinstance(value, int) else (2, value)
 
 
-def extract_competitors(data, link):
-    images = safe_get(data, 6, 99, 0, 0, 1) or []
+def extract_competitors(values, link):
+    images = values["competitors"] or []
     ls = []
     hl = get_hl_from_link_competitors(link)
     for element in images:
@@ -261,8 +379,8 @@ def extract_time_data(data):
     return ls
 
 
-def extract_popular_times(data):
-    images = safe_get(data, 6, 84, 0) or []
+def extract_popular_times(values):
+    images = values["popular_times"] or []
 
     if not images:
         return "Not Present"
@@ -283,8 +401,8 @@ def extract_popular_times(data):
     return rs
 
 
-def get_reservations(data):
-    images = safe_get(data, 6, 46) or []
+def get_reservations(values):
+    images = values["reservations"] or []
     ls = []
     for element in images:
         link, source = element[0], element[1]
@@ -292,8 +410,8 @@ def get_reservations(data):
     return ls
 
 
-def get_order_online_link(data):
-    images = safe_get(data, 6, 75, 0, 1, 2) or safe_get(data, 6, 75, 0, 0, 2) or []
+def get_order_online_link(values):
+    images = values["order_online_links"] or values["order_online_links_fallback"] or []
     ls = []
     for element in images:
         source, link = safe_get(element, 0, 0), safe_get(element, 1, 2, 0)
@@ -301,8 +419,8 @@ def get_order_online_link(data):
     return ls
 
 
-def get_hours(data):
-    images = safe_get(data, 6, 34, 1) or []
+def get_hours(values):
+    images = values["hours"] or []
     ls = []
     for element in images:
         day, times = element[0], element[1]
@@ -310,8 +428,8 @@ def get_hours(data):
     return ls
 
 
-def get_review_keywords(data):
-    images = safe_get(data, 6, 153, 0) or []
+def get_review_keywords(values):
+    images = values["review_keywords"] or []
     ls = []
     for element in images:
         keyword, count = element[1], element[3][4]
@@ -326,8 +444,8 @@ def get_options(data):
     ]
 
 
-def get_about(data):
-    rvs = safe_get(data, 6, 100, 1) or []
+def get_about(values):
+    rvs = values["about"] or []
     ls = []
     for element in rvs:
         id, name, options = element[0], element[1], get_options(element[2] or [])
@@ -335,9 +453,9 @@ def get_about(data):
     return ls
 
 
-def get_menu(data):
-    link = safe_get(data, 6, 38, 0)
-    source = safe_get(data, 6, 38, 1)
+def get_menu(values):
+    link = values["menu_link"]
+    source = values["menu_source"]
     return {"link": clean_link(link), "source": source}
 
 
@@ -373,8 +491,8 @@ def generate_google_reviews_url(placeid, query, authuser, hl, gl):
     return full_url
 
 
-def get_user_reviews(data):
-    rvs = safe_get(data, 6, 52, 0) or []
+def get_user_reviews(values):
+    rvs = values["featured_reviews"] or []
     ls = []
     for element in rvs:
         name, profile_picture, when, rating, description = (
@@ -443,21 +561,21 @@ def get_user_reviews(data):
     return ls
 
 
-def get_owner(data):
-    name = safe_get(data, 6, 57, 1)
-    id = safe_get(data, 6, 57, 2)
+def get_owner(values):
+    name = values["owner_name"]
+    id = values["owner_id"]
     link = f"https://www.google.com/maps/contrib/{id}" if id else None
     return {"id": id, "name": name, "link": clean_link(link) if link else None}
     # if id else {'name': name}
 
 
-def get_complete_address(data):
-    ward = safe_get(data, 6, 183, 1, 0)
-    street = safe_get(data, 6, 183, 1, 1)
-    city = safe_get(data, 6, 183, 1, 3)
-    postal_code = safe_get(data, 6, 183, 1, 4)
-    state = safe_get(data, 6, 183, 1, 5)
-    country_code = safe_get(data, 6, 183, 1, 6)
+def get_complete_address(values):
+    ward = values["ward"]
+    street = values["street"]
+    city = values["city"]
+    postal_code = values["postal_code"]
+    state = values["state"]
+    country_code = values["country_code"]
 
     result = {
         "ward": ward,
@@ -470,71 +588,145 @@ def get_complete_address(data):
     return result
 
 
-def get_time_zone(data):
-    return safe_get(data, 6, 30)
+def get_time_zone(values):
+    return values["time_zone"]
 
 
-def get_reviews_link(data):
-    return clean_link(safe_get(data, 6, 4, 3, 0))
+def get_reviews_link(values):
+    return clean_link(values["reviews_link"])
 
 
-def get_rating(data):
-    return safe_get(data, 6, 4, 7) or 0
+def get_rating(values):
+    return values["rating"] or 0
 
 
-def get_reviews(data):
-    return safe_get(data, 6, 4, 8) or 0
+def get_reviews(values):
+    return values["reviews"] or 0
 
 
-def get_phone(data):
-    return safe_get(data, 6, 178, 0, 0)
+def get_phone(values):
+    return values["phone"]
 
 
-def get_price_range(data):
-    rs = safe_get(data, 6, 4, 2)
+def get_price_range(values):
+    rs = values["price_range"]
 
     if rs is not None:
         return len(rs) * "$"
 
 
-def get_title(data):
-    return safe_get(data, 6, 11)
+def get_title(values):
+    return values["title"]
 
 
-def get_address(data):
-    return safe_get(data, 6, 18)
+def get_address(values):
+    return values["address"]
 
 
-def get_website(data):
-    return clean_link(safe_get(data, 6, 7, 0))
+def get_website(values):
+    return clean_link(values["website"])
 
 
-def get_main_category(data):
-    return safe_get(data, 6, 13, 0)
+def get_main_category(values):
+    return values["main_category"]
 
 
-def get_cid(data):
-    return safe_get(data, 25, 3, 0, 13, 0, 0, 1)
+def get_cid(values):
+    return values["cid"]
 
 
-def get_data_id(data):
-    return safe_get(data, 6, 10)
+def get_data_id(values):
+    return values["data_id"]
 
 
-def get_reviews_per_rating(data):
-    return {i: safe_get(data, 6, 52, 3, i - 1) for i in range(1, 6)}
+def get_reviews_per_rating(values):
+    return {i: safe_get(values["reviews_per_rating"], i - 1) for i in range(1, 6)}
 
 
-def parse(data):
-    # Assuming 'input_string' is provided to the function in some way
-    input_string = json.loads(data)[3][6]  # Replace with actual input
+INITIALIZATION_STATE_START = ';window.APP_INITIALIZATION_STATE='
+INITIALIZATION_STATE_END = ';window.APP_FLAGS'
+
+
+def get_initialization_state(html):
+    """Returns the JSON of window.APP_INITIALIZATION_STATE in the html, copying only that part of the page."""
+    start = html.find(INITIALIZATION_STATE_START)
+    if start == -1:
+        raise ValueError("APP_INITIALIZATION_STATE not found in the page")
+    start += len(INITIALIZATION_STATE_START)
+    end = html.find(INITIALIZATION_STATE_END, start)
+    return html[start:] if end == -1 else html[start:end]
+
+
+_WHITESPACE = rex.compile(r'\s*')
+_json_decoder = JSONDecoder()
+
+
+def iter_item_offsets(data, pos):
+    """
+    Yields the offsets of the items of the JSON array starting at pos.
+
+    The items before the one being looked for are skipped by decoding them one at a time
+    with the C scanner of the json module, so the rest of the array is never built.
+    """
+    pos = _WHITESPACE.match(data, pos + 1).end()
+    if data.startswith(']', pos):
+        return
+    while True:
+        yield pos
+        end = _json_decoder.raw_decode(data, pos)[1]
+        pos = _WHITESPACE.match(data, end).end()
+        if not data.startswith(',', pos):
+            return
+        pos = _WHITESPACE.match(data, pos + 1).end()
+
+
+def find_json_item(data, *indexes):
+    """Returns the offset of loads(data)[index][index]... in the JSON text data, or None if it is not there."""
+    pos = _WHITESPACE.match(data).end()
+    for index in indexes:
+        if not data.startswith('[', pos):
+            return None
+        offsets = iter_item_offsets(data, pos)
+        try:
+            if index < 0:
+                offsets = list(offsets)
+                pos = offsets[index] if -index <= len(offsets) else None
+            else:
+                pos = next(islice(offsets, index, None), None)
+        except ValueError:
+            # Not valid JSON
+            return None
+        if pos is None:
+            return None
+    return pos
+
+
+def load_nested_json(data, *indexes):
+    """
+    Decodes the JSON Google nests as a string, prefixed with )]}', at loads(data)[index][index]...
+
+    With the json module, only that string and the items before it are decoded, rather than the whole state,
+    and those items are dropped as soon as they are skipped. States of another shape are decoded whole, as before.
+    orjson decodes the whole state faster than the json module skips to the string, so with it the state is decoded whole.
+    """
+    pos = None
+    if getattr(get_json_codec(), "name", None) != ORJSON:
+        pos = find_json_item(data, *indexes)
+    if pos is not None and data.startswith('"', pos):
+        input_string = scanstring(data, pos + 1)[0]
+    else:
+        input_string = safe_get(loads(data), *indexes)
     substring_to_remove = ")]}'"
 
     modified_string = input_string
     if input_string.startswith(substring_to_remove):
         modified_string = input_string[len(substring_to_remove) :]
 
-    return json.loads(modified_string)
+    return loads(modified_string)
+
+
+def parse(data):
+    return load_nested_json(data, 3, 6)
 
 
 def get_hl_from_link(link):
@@ -688,17 +880,7 @@ def extract_most_popular_times(data):
 
 
 def parse_extract_possible_map_link(data):
-    # Assuming 'input_string' is provided to the function in some way
-    loaded = json.loads(data)
-
-    input_string = safe_get(loaded, 3, -1)  # Replace with actual input
-    substring_to_remove = ")]}'"
-
-    modified_string = input_string
-    if input_string.startswith(substring_to_remove):
-        modified_string = input_string[len(substring_to_remove) :]
-
-    return json.loads(modified_string)
+    return load_nested_json(data, 3, -1)
 
 
 def perform_extract_possible_map_link(input_str):
@@ -706,97 +888,104 @@ def perform_extract_possible_map_link(input_str):
     return safe_get(data, 6, 27) or safe_get(data, 0, 1, 0, 14, 27)
 
 
-def extract_data(input_str, link):
-    data = parse(input_str)
-
-    categories = get_categories(data)
-    place_id = get_place_id(data)
-    order_online_links = get_order_online_link(data)
-    thumbnail = get_thumbnail(data)
-    coordinates = get_gps_coordinates(data)
-    images = get_images(data)
-    description = get_description(data)
-    status = get_open_state(data)
-    plus_code = get_plus_code(data)
-    reservations = get_reservations(data)
-    menu = get_menu(data)
-    owner = get_owner(data)
-    time_zone = get_time_zone(data)
-    complete_address = get_complete_address(data)
-    reviews_link = get_reviews_link(data)
+def extract_reviews_link(values, link, place):
+    reviews_link = get_reviews_link(values)
     if reviews_link is None:
-        gl = complete_address["country_code"]
+        gl = place[Fields.DETAILED_ADDRESS]["country_code"]
         hl = get_hl_from_link(link)
         query = extract_business_name(link)
-        reviews_link = generate_google_reviews_url(place_id, query, 0, hl, gl)
+        reviews_link = generate_google_reviews_url(place[Fields.PLACE_ID], query, 0, hl, gl)
+    return reviews_link
 
-    price_range = get_price_range(data)
-    reviews_per_rating = get_reviews_per_rating(data)
-    cid = get_cid(data)
-    data_id = get_data_id(data)
-    about = get_about(data)
-    title = get_title(data)
 
-    hours = get_hours(data)
+def extract_hours(values):
+    hours = get_hours(values)
     if hours:
-        hours = reorder_hours_list(hours)
-    else:
-        hours = []
-
-    rating = get_rating(data)
-    reviews = get_reviews(data)
-    phone = get_phone(data)
-    address = get_address(data)
-    website = get_website(data)
-    main_category = get_main_category(data)
-    user_reviews = get_user_reviews(data)
-
-    review_keywords = get_review_keywords(data)
-
-    first_question = extract_questions(data)
-
-    competitors = extract_competitors(data, link)
-    popular_times = extract_popular_times(data)
-    most_popular_times = extract_most_popular_times(popular_times)
-    is_claimed = get_can_claim(data)
-    # bt.write_temp_json(data)
-    return {
-        "place_id": place_id,
-        "name": title,
-        "description": description,
-        "reviews": reviews,
-        "competitors": competitors,
-        "website": website,
-        "can_claim": is_claimed,
-        "owner": owner,
-        "featured_image": thumbnail,
-        "main_category": main_category,
-        "categories": categories,
-        "rating": rating,
-        "workday_timing": extract_work_day_time(hours),
-        "closed_on": find_close_days(hours),
-        "phone": phone,
-        "address": address,
-        "review_keywords": review_keywords,
-        "link": link,
-        "status": status,
-        "price_range": price_range,
-        "reviews_per_rating": reviews_per_rating,
-        "featured_question": first_question,
-        "reviews_link": reviews_link,
-        "coordinates": coordinates,
-        "plus_code": plus_code,
-        "detailed_address": complete_address,
-        "time_zone": time_zone,
-        "cid": cid,
-        "data_id": data_id,
-        "menu": menu,
-        "reservations": reservations,
-        "order_online_links": order_online_links,
-        "about": about,
-        "images": images,
-        "hours": hours,
-        "most_popular_times": most_popular_times,
-        "popular_times": popular_times,
-        "featured_reviews": user_reviews,
-    }
+        return reorder_hours_list(hours)
+    return []
+
+
+# How every field of a place is extracted, from the values of PLACE_PATHS, the link and the fields it depends on
+EXTRACTORS = {
+    Fields.PLACE_ID: lambda values, link, place: get_place_id(values),
+    Fields.NAME: lambda values, link, place: get_title(values),
+    Fields.DESCRIPTION: lambda values, link, place: get_description(values),
+    Fields.REVIEWS: lambda values, link, place: get_reviews(values),
+    Fields.COMPETITORS: lambda values, link, place: extract_competitors(values, link),
+    Fields.WEBSITE: lambda values, link, place: get_website(values),
+    Fields.CAN_CLAIM: lambda values, link, place: get_can_claim(values),
+    Fields.OWNER: lambda values, link, place: get_owner(values),
+    Fields.FEATURED_IMAGE: lambda values, link, place: get_thumbnail(values),
+    Fields.MAIN_CATEGORY: lambda values, link, place: get_main_category(values),
+    Fields.CATEGORIES: lambda values, link, place: get_categories(values),
+    Fields.RATING: lambda values, link, place: get_rating(values),
+    Fields.WORKDAY_TIMING: lambda values, link, place: extract_work_day_time(place[Fields.HOURS]),
+    Fields.CLOSED_ON: lambda values, link, place: find_close_days(place[Fields.HOURS]),
+    Fields.PHONE: lambda values, link, place: get_phone(values),
+    Fields.ADDRESS: lambda values, link, place: get_address(values),
+    Fields.REVIEW_KEYWORDS: lambda values, link, place: get_review_keywords(values),
+    Fields.LINK: lambda values, link, place: link,
+    Fields.STATUS: lambda values, link, place: get_open_state(values),
+    Fields.PRICE_RANGE: lambda values, link, place: get_price_range(values),
+    Fields.REVIEWS_PER_RATING: lambda values, link, place: get_reviews_per_rating(values),
+    Fields.FEATURED_QUESTION: lambda values, link, place: extract_questions(values),
+    Fields.REVIEWS_LINK: extract_reviews_link,
+    Fields.COORDINATES: lambda values, link, place: get_gps_coordinates(values),
+    Fields.PLUS_CODE: lambda values, link, place: get_plus_code(values),
+    Fields.DETAILED_ADDRESS: lambda values, link, place: get_complete_address(values),
+    Fields.TIME_ZONE: lambda values, link, place: get_time_zone(values),
+    Fields.CID: lambda values, link, place: get_cid(values),
+    Fields.DATA_ID: lambda values, link, place: get_data_id(values),
+    Fields.MENU: lambda values, link, place: get_menu(values),
+    Fields.RESERVATIONS: lambda values, link, place: get_reservations(values),
+    Fields.ORDER_ONLINE_LINKS: lambda values, link, place: get_order_online_link(values),
+    Fields.ABOUT: lambda values, link, place: get_about(values),
+    Fields.IMAGES: lambda values, link, place: get_images(values),
+    Fields.HOURS: lambda values, link, place: extract_hours(values),
+    Fields.MOST_POPULAR_TIMES: lambda values, link, place: extract_most_popular_times(place[Fields.POPULAR_TIMES]),
+    Fields.POPULAR_TIMES: lambda values, link, place: extract_popular_times(values),
+    Fields.FEATURED_REVIEWS: lambda values, link, place: get_user_reviews(values),
+}
+
+# Fields computed from other fields, which are extracted before them
+FIELD_DEPENDENCIES = {
+    Fields.WORKDAY_TIMING: [Fields.HOURS],
+    Fields.CLOSED_ON: [Fields.HOURS],
+    Fields.REVIEWS_LINK: [Fields.PLACE_ID, Fields.DETAILED_ADDRESS],
+    Fields.MOST_POPULAR_TIMES: [Fields.POPULAR_TIMES],
+}
+
+
+@lru_cache(maxsize=None)
+def plan_extraction(fields=None):
+    """
+    Returns the fields to extract for a tuple of fields, in the order they are extracted,
+    including the fields they depend on. Fields which are not extracted, like socials, are left out.
+    None plans every field.
+    """
+    plan = []
+
+    def add(field):
+        if field in plan or field not in EXTRACTORS:
+            return
+        for dependency in FIELD_DEPENDENCIES.get(field, []):
+            add(dependency)
+        plan.append(field)
+
+    for field in EXTRACTORS if fields is None else fields:
+        add(field)
+    return tuple(plan)
+
+
+def extract_data(input_str, link, fields=None):
+    """
+    Extracts a place from its APP_INITIALIZATION_STATE.
+
+    :param fields: Fields to extract, along with the fields they depend on. None extracts every field.
+    """
+    values = resolve_place_paths(parse(input_str))
+
+    place = {}
+    for field in plan_extraction(None if fields is None else tuple(fields)):
+        place[field] = EXTRACTORS[field](values, link, place)
+    return place
@@ -1,15 +1,22 @@
+import os
 from botasaurus import bt
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Union
 from src import scraper
-from src.write_output import write_output
+from src.write_output import OutputWriter, write_output
+from src.output_sinks import import_pyarrow
+from src.journal import DETAILS, REVIEWS, SEARCHED, SOCIALS, WRITTEN, create_journal
 from src.sort_filter import filter_places, sort_places
+from src.pipeline import iter_in_parallel, run_pipeline
+from src.extract_data import EXTRACTORS
+from src.archive import StateArchive, extract_archived_batch
+from src.process_pool import map_in_processes
 from .cities import Cities
 from .lang import Lang
 from .category import Category
 from .fields import ALL_FIELDS, ALL_SOCIAL_FIELDS, DEFAULT_SOCIAL_FIELDS, Fields, DEFAULT_FIELDS, DEFAULT_FIELDS_WITHOUT_SOCIAL_DATA, ALL_FIELDS_WITHOUT_SOCIAL_DATA
 from .social_scraper import FAILED_DUE_TO_CREDITS_EXHAUSTED, FAILED_DUE_TO_NOT_SUBSCRIBED, FAILED_DUE_TO_UNKNOWN_ERROR, scrape_social
 
-def create_place_data(query, is_spending_on_ads, max, lang, geo_coordinates, zoom, convert_to_english):
+def create_place_data(query, is_spending_on_ads, max, lang, geo_coordinates, zoom, convert_to_english, extracted_fields=None, archive=False, processes=1):
     place_data = {
             "query": query,
             "is_spending_on_ads": is_spending_on_ads,
@@ -19,6 +26,13 @@ def create_place_data(query, is_spending_on_ads, max, lang, geo_coordinates, zoo
             "zoom": zoom, 
             "convert_to_english": convert_to_english
         }
+    if extracted_fields is not None:
+        # Left out when every field is extracted, so those searches keep their cache keys
+        place_data["fields"] = extracted_fields
+    if archive:
+        place_data["archive"] = True
+    if processes != 1:
+        place_data["processes"] = processes
     return place_data
 
 
@@ -84,9 +98,17 @@ def get_empty_data():
   }
   return EMPTY_SOCIAL_DATA
 
+def index_by_place_id(items):
+    # Keeps the first item of each place_id, the one a linear search would find.
+    index = {}
+    for item in items:
+        index.setdefault(item['place_id'], item)
+    return index
+
 def merge_social(places, social_details):
+    social_details_by_place_id = index_by_place_id(social_details)
     for place in places:
-        found_social_detail = next((detail for detail in social_details if detail['place_id'] == place['place_id']), None)
+        found_social_detail = social_details_by_place_id.get(place['place_id'])
         if found_social_detail:
             place.update(found_social_detail['data'])
         else:
@@ -130,9 +152,10 @@ def create_reviews_data(places, reviews_max, reviews_sort, convert_to_english, l
     return reviews_data
 
 def merge_reviews(places, reviews):
+    reviews_by_place_id = index_by_place_id(bt.remove_nones(reviews))
     for place in places:
         # Find the reviews for the current place based on place_id
-        found_review = next((review for review in reviews if review['place_id'] == place['place_id']), None)
+        found_review = reviews_by_place_id.get(place['place_id'])
 
         # Add the 'reviews' from the found review to the place, or an empty list if no review is found
         place['detailed_reviews'] = found_review['reviews'] if found_review else []
@@ -177,11 +200,40 @@ def determine_fields(fields, should_scrape_socials, scrape_reviews):
     #   print(fields)
       return fields
 
-def process_result(min_reviews, max_reviews, category_in, has_website,can_claim, has_phone, min_rating, max_rating, sort, key, scrape_reviews, reviews_max, reviews_sort, fields, lang, should_scrape_socials,convert_to_english, cache, places_obj):
-      places = places_obj["places"]
-      query = places_obj["query"]
-        # Sort and Filter TODO: do later
-      filter_data = {
+# The field each filter reads
+FILTER_FIELDS = {
+    "min_rating": Fields.RATING,
+    "max_rating": Fields.RATING,
+    "min_reviews": Fields.REVIEWS,
+    "max_reviews": Fields.REVIEWS,
+    "has_phone": Fields.PHONE,
+    "has_website": Fields.WEBSITE,
+    "can_claim": Fields.CAN_CLAIM,
+    "category_in": Fields.MAIN_CATEGORY,
+}
+
+def determine_extracted_fields(fields, filter_data, sort, should_scrape_socials, scrape_reviews):
+      """
+      Returns the fields scrape_place extracts, which are the output fields and the fields the filters,
+      the sort, and scraping socials and reviews read. None when every field is extracted.
+      """
+      # Places are merged with their socials and reviews by place_id and with the sponsored links by link,
+      # and the reviews and images outputs have the place name
+      needed = {Fields.PLACE_ID, Fields.NAME, Fields.LINK, *fields}
+      needed.update(FILTER_FIELDS[name] for name, value in filter_data.items() if value is not None)
+      needed.update(sort_by[0] for sort_by in sort or [])
+      if should_scrape_socials:
+          needed.add(Fields.WEBSITE)
+      if scrape_reviews:
+          needed.add(Fields.REVIEWS)
+
+      extracted_fields = [field for field in EXTRACTORS if field in needed]
+      if len(extracted_fields) == len(EXTRACTORS):
+          return None
+      return extracted_fields
+
+def create_filter_data(min_reviews, max_reviews, category_in, has_website, can_claim, has_phone, min_rating, max_rating):
+      return {
             "min_rating":min_rating,
             "max_rating":max_rating,
             "min_reviews":min_reviews,
@@ -192,6 +244,11 @@ def process_result(min_reviews, max_reviews, category_in, has_website,can_claim,
 
             "category_in":category_in,
         }
+
+def filter_and_scrape_socials(filter_data, sort, key, should_scrape_socials, cache, places_obj):
+      places = places_obj["places"]
+      query = places_obj["query"]
+        # Sort and Filter TODO: do later
       cleaned_places = filter_places(places, filter_data)
         
         # 2. Scrape Emails
@@ -204,26 +261,81 @@ def process_result(min_reviews, max_reviews, category_in, has_website,can_claim,
           cleaned_places = merge_social(cleaned_places, success)
 
       cleaned_places =  sort_places(cleaned_places, sort)
+      return {"query": query, "places": cleaned_places}
+
+def scrape_and_merge_reviews(reviews_max, reviews_sort, convert_to_english, lang, cache, places_obj):
+      cleaned_places = places_obj["places"]
         # 3. Scrape Reviews
+      placed_with_reviews = filter_places(cleaned_places, {"min_reviews": 1})
+      reviews_data = create_reviews_data(placed_with_reviews, reviews_max, reviews_sort, convert_to_english, lang)
+      reviews_details =  scraper.scrape_reviews(reviews_data, cache=cache)
+        # print_social_errors
+      cleaned_places = merge_reviews(cleaned_places, reviews_details)
+      return {"query": places_obj["query"], "places": cleaned_places}
+
+def write_result(fields, parquet, places_obj):
+        # 4. Write Output
+      write_output(places_obj["query"], places_obj["places"], fields, parquet)
+      return places_obj
+
+def append_to_all_output(all_output, places_obj):
+      if all_output is not None:
+          all_output.write_places(places_obj["places"])
+      return places_obj
+
+def journaled(journal, stage, fn):
+      """
+      Makes fn record the places_obj it returns in the journal, and skips it for queries which finished the stage before a restart.
+      """
+      if journal is None:
+          return fn
+
+      def run(places_obj):
+          if journal.is_done(places_obj["query"], stage):
+              return places_obj
+          places_obj = fn(places_obj)
+          journal.record(places_obj["query"], stage, places_obj)
+          return places_obj
+      return run
+
+def process_result(min_reviews, max_reviews, category_in, has_website,can_claim, has_phone, min_rating, max_rating, sort, key, scrape_reviews, reviews_max, reviews_sort, fields, lang, should_scrape_socials,convert_to_english, cache, places_obj, parquet=False, all_output=None, journal=None):
+      for stage in create_enrichment_stages(min_reviews, max_reviews, category_in, has_website,can_claim, has_phone, min_rating, max_rating, sort, key, scrape_reviews, reviews_max, reviews_sort, fields, lang, should_scrape_socials,convert_to_english, cache, parquet, all_output, journal):
+          places_obj = stage(places_obj)
+      return places_obj
+
+def create_enrichment_stages(min_reviews, max_reviews, category_in, has_website,can_claim, has_phone, min_rating, max_rating, sort, key, scrape_reviews, reviews_max, reviews_sort, fields, lang, should_scrape_socials,convert_to_english, cache, parquet=False, all_output=None, journal=None):
+      """
+      Splits processing a places_obj into stages for run_pipeline, each one receiving and returning a places_obj.
+      """
+      filter_data = create_filter_data(min_reviews, max_reviews, category_in, has_website, can_claim, has_phone, min_rating, max_rating)
+
+      stages = [journaled(journal, SOCIALS, lambda places_obj: filter_and_scrape_socials(filter_data, sort, key, should_scrape_socials, cache, places_obj))]
       if scrape_reviews:
-          placed_with_reviews = filter_places(cleaned_places, {"min_reviews": 1})
-          reviews_data = create_reviews_data(placed_with_reviews, reviews_max, reviews_sort, convert_to_english, lang)
-          reviews_details =  scraper.scrape_reviews(reviews_data, cache=cache)
-            # print_social_errors
-          cleaned_places = merge_reviews(cleaned_places, reviews_details)
+          stages.append(journaled(journal, REVIEWS, lambda places_obj: scrape_and_merge_reviews(reviews_max, reviews_sort, convert_to_english, lang, cache, places_obj)))
 
-        # 4. Write Output
-      write_output(query, cleaned_places, fields)
-        
-      result_item = {"query": query, "places": cleaned_places}
-      return result_item
+      write = journaled(journal, WRITTEN, lambda places_obj: write_result(fields, parquet, places_obj))
+      # Queries written before a restart are still added to the "all" output
+      stages.append(lambda places_obj: append_to_all_output(all_output, write(places_obj)))
+
+      return stages
+
+
+MAX_BROWSERS = "max"
 
+def determine_browsers(browsers):
+    if browsers == MAX_BROWSERS:
+        # Scrolling the feed keeps a core busy, so don't run more browsers than cores.
+        return max(1, min(bt.calc_max_parallel_browsers(), os.cpu_count() or 1))
 
-def merge_places(places):
-    merged_places = []
-    for place_group in places:
-        merged_places.extend(place_group['places'])
-    return merged_places
+    if browsers is None or browsers < 1:
+        return 1
+    return int(browsers)
+
+def map_indexed(stage):
+    return lambda indexed: (indexed[0], stage(indexed[1]))
+
+def sort_by_index(indexed_items):
+    return [item for _, item in sorted(indexed_items, key=lambda indexed: indexed[0])]
 
 class Gmaps:
   SORT_DESCENDING = "desc"
@@ -244,6 +356,9 @@ class Gmaps:
 
   DEFAULT_SORT = [SORT_BY_REVIEWS_DESCENDING, SORT_BY_HAS_WEBSITE, SORT_BY_NOT_HAS_LINKEDIN, SORT_BY_IS_SPENDING_ON_ADS]
   ALL_REVIEWS = None
+  ALL_CORES = None
+
+  MAX_BROWSERS = MAX_BROWSERS
 
   MOST_RELEVANT = "most_relevant" 
   NEWEST  = "newest"
@@ -288,7 +403,13 @@ class Gmaps:
              fields: Optional[List[str]] = DEFAULT_FIELDS,
              lang: Optional[str] = None,
              geo_coordinates: Optional[str] = None,
-             zoom: Optional[float] = None) -> List[Dict]:
+             zoom: Optional[float] = None,
+             pipeline: bool = False,
+             browsers: Union[int, str] = 1,
+             parquet: bool = False,
+             resume: bool = False,
+             archive: bool = False,
+             processes: Optional[int] = 1) -> List[Dict]:
       """
       Function to scrape Google Maps places based on various criteria.
 
@@ -309,10 +430,16 @@ class Gmaps:
       :param scrape_reviews: Boolean indicating if the reviews should be scraped.
       :param reviews_max: Maximum number of reviews to scrape per place.
       :param reviews_sort: Sort order for reviews.
-      :param fields: List of fields to return in the result.
+      :param fields: List of fields to return in the result. Only these fields, and the ones the filters and the sort need, are extracted from the places.
       :param lang: Language in which to return the results.
       :param geo_coordinates: Geographical coordinates to scrape around.
       :param zoom: Zoom level for scraping.
+      :param pipeline: Boolean indicating whether to search the next query while the socials, reviews and output of the previous query are being processed.
+      :param browsers: Number of browsers searching queries in parallel, or Gmaps.MAX_BROWSERS to use as many as the RAM and cores of the machine allow.
+      :param parquet: Boolean indicating whether to also write the places, reviews and images as Parquet files, which needs the pyarrow package.
+      :param resume: Boolean indicating whether to journal the stages every query finishes, so that running the same queries again after a crash continues where the run stopped.
+      :param archive: Boolean indicating whether to archive the raw data of every place fetched, so that Gmaps.from_archive can extract the places again without fetching them.
+      :param processes: Number of processes extracting the places, or Gmaps.ALL_CORES to use every core. With 1, the places are extracted in the threads fetching them.
       :return: List of dictionaries with the scraped place data.
       """
 
@@ -320,18 +447,67 @@ class Gmaps:
 
       should_scrape_socials = key is not None      
       fields = determine_fields(fields, should_scrape_socials, scrape_reviews) 
+      extracted_fields = determine_extracted_fields(fields, create_filter_data(min_reviews, max_reviews, category_in, has_website, can_claim, has_phone, min_rating, max_rating), sort, should_scrape_socials, scrape_reviews)
           
-      for query in queries:
+      n_browsers = determine_browsers(browsers)
+
+      journal = create_journal(resume, "places", {
+          "is_spending_on_ads": is_spending_on_ads, "max": max, "lang": lang, "geo_coordinates": geo_coordinates, "zoom": zoom, "convert_to_english": convert_to_english,
+          "filter": create_filter_data(min_reviews, max_reviews, category_in, has_website, can_claim, has_phone, min_rating, max_rating), "sort": sort, "key": key,
+          "scrape_reviews": scrape_reviews, "reviews_max": reviews_max, "reviews_sort": reviews_sort, "fields": fields, "parquet": parquet,
+      })
+
+      # Queries which finished a stage before a restart continue from it instead of being searched again
+      journaled_objs = {}
+      if journal is not None:
+        for query in queries:
+          stage, places_obj = journal.get(query)
+          if stage is not None:
+            journaled_objs[query] = places_obj
+
+      def search(query):
         # 1. Scrape Places
-        place_data = create_place_data(query, is_spending_on_ads, max, lang, geo_coordinates, zoom, convert_to_english)
+        place_data = create_place_data(query, is_spending_on_ads, max, lang, geo_coordinates, zoom, convert_to_english, extracted_fields, archive, processes)
         places_obj = scraper.scrape_places(place_data, cache = use_cache)
+        if journal is not None:
+          journal.record(query, SEARCHED, places_obj)
+        return places_obj
+
+      def iter_searched():
+        # Every browser searches the next query as soon as it is done with its own, and the queries are processed
+        # as they finish, so one query with a long feed doesn't keep the other browsers waiting.
+        pending = []
+        for index, query in enumerate(queries):
+          if query in journaled_objs:
+            yield index, journaled_objs[query]
+          else:
+            pending.append(index)
+
+        for position, places_obj in iter_in_parallel(lambda index: search(queries[index]), pending, n_browsers):
+          yield pending[position], places_obj
+
+      # The places of every query are appended to the "all" output as soon as the query is written,
+      # so it holds the places scraped so far during long runs.
+      all_output = OutputWriter("all", fields, json_lines=True, parquet=parquet)
+      try:
+        if pipeline:
+          stages = create_enrichment_stages(min_reviews, max_reviews, category_in, has_website,can_claim, has_phone, min_rating, max_rating, sort, key, scrape_reviews, reviews_max, reviews_sort, fields, lang, should_scrape_socials, convert_to_english,use_cache, parquet, all_output, journal)
+          indexed_results = run_pipeline(iter_searched(), [map_indexed(stage) for stage in stages])
+        else:
+          indexed_results = []
+          for index, places_obj in iter_searched():
+            result_item = process_result(min_reviews, max_reviews, category_in, has_website,can_claim, has_phone, min_rating, max_rating, sort, key, scrape_reviews, reviews_max, reviews_sort, fields, lang, should_scrape_socials, convert_to_english,use_cache,places_obj, parquet, all_output, journal)
 
-        result_item = process_result(min_reviews, max_reviews, category_in, has_website,can_claim, has_phone, min_rating, max_rating, sort, key, scrape_reviews, reviews_max, reviews_sort, fields, lang, should_scrape_socials, convert_to_english,use_cache,places_obj)
+            indexed_results.append((index, result_item))
+        # Returned in the order of the queries, whichever finished first
+        result = sort_by_index(indexed_results)
+      finally:
+        all_output.close()
 
-        result.append(result_item)
-      
-      all_places = sort_places(merge_places(result), sort)
-      write_output("all", all_places, fields)
+      if journal is not None:
+        # Every query is done, so running the job again starts over
+        journal.clear()
+        journal.close()
 
       scraper.scrape_places.close()
       return result
@@ -359,7 +535,11 @@ class Gmaps:
               reviews_max: int = 20,
               reviews_sort: int = NEWEST,
               fields: Optional[List[str]] = DEFAULT_FIELDS,
-              lang: Optional[str] = None) -> List[Dict]:
+              lang: Optional[str] = None,
+              parquet: bool = False,
+              resume: bool = False,
+              archive: bool = False,
+              processes: Optional[int] = 1) -> List[Dict]:
         """
         Function to scrape data from specific Google Maps place links.
 
@@ -380,21 +560,129 @@ class Gmaps:
         :param scrape_reviews: Boolean indicating if the reviews should be scraped.
         :param reviews_max: Maximum number of reviews to scrape per place.
         :param reviews_sort: Sort order for reviews.
-        :param fields: List of fields to return in the result.
+        :param fields: List of fields to return in the result. Only these fields, and the ones the filters and the sort need, are extracted from the places.
         :param lang: Language in which to return the results.
+        :param parquet: Boolean indicating whether to also write the places, reviews and images as Parquet files, which needs the pyarrow package.
+        :param resume: Boolean indicating whether to journal the stages the links finish, so that running the same links again after a crash continues where the run stopped.
+        :param archive: Boolean indicating whether to archive the raw data of every place fetched, so that Gmaps.from_archive can extract the places again without fetching them.
+        :param processes: Number of processes extracting the places, or Gmaps.ALL_CORES to use every core. With 1, the places are extracted in the threads fetching them.
         :return: List of dictionaries with the scraped data for each link.
         """
 
+        if parquet:
+            # Fail before scraping rather than when writing the output
+            import_pyarrow()
+
   
         should_scrape_socials = key is not None      
         fields = determine_fields(fields, should_scrape_socials, scrape_reviews) 
+        extracted_fields = determine_extracted_fields(fields, create_filter_data(min_reviews, max_reviews, category_in, has_website, can_claim, has_phone, min_rating, max_rating), sort, should_scrape_socials, scrape_reviews)
 
         if max is not None:
             links = links[:max]
 
-        places = scraper.scrape_places_by_links({"links": links, "convert_to_english": convert_to_english, "cache": use_cache}, cache=use_cache)
-        scraper.scrape_places_by_links.close()
-        places_obj  = {"query":output_folder, "places": places }
-        result_item = process_result(min_reviews, max_reviews, category_in, has_website,can_claim, has_phone, min_rating, max_rating, sort, key, scrape_reviews, reviews_max, reviews_sort, fields, lang, should_scrape_socials,convert_to_english, use_cache,places_obj)
+        journal = create_journal(resume, "links", {
+            "links": links, "convert_to_english": convert_to_english,
+            "filter": create_filter_data(min_reviews, max_reviews, category_in, has_website, can_claim, has_phone, min_rating, max_rating), "sort": sort, "key": key,
+            "scrape_reviews": scrape_reviews, "reviews_max": reviews_max, "reviews_sort": reviews_sort, "fields": fields, "parquet": parquet,
+        })
+
+        stage, places_obj = journal.get(output_folder) if journal is not None else (None, None)
+        if stage is None:
+            links_data = {"links": links, "convert_to_english": convert_to_english, "cache": use_cache}
+            if extracted_fields is not None:
+                links_data["fields"] = extracted_fields
+            if archive:
+                links_data["archive"] = True
+            if processes != 1:
+                links_data["processes"] = processes
+            places = scraper.scrape_places_by_links(links_data, cache=use_cache)
+            scraper.scrape_places_by_links.close()
+            places_obj  = {"query":output_folder, "places": places }
+            if journal is not None:
+                journal.record(output_folder, DETAILS, places_obj)
+
+        result_item = process_result(min_reviews, max_reviews, category_in, has_website,can_claim, has_phone, min_rating, max_rating, sort, key, scrape_reviews, reviews_max, reviews_sort, fields, lang, should_scrape_socials,convert_to_english, use_cache,places_obj, parquet, journal=journal)
+
+        if journal is not None:
+            journal.clear()
+            journal.close()
         
         return result_item
+
+  @staticmethod
+  def from_archive(
+              output_folder: str,
+              links: Optional[List[str]] = None,
+              min_reviews: Optional[int] = None,
+              max_reviews: Optional[int] = None,
+              category_in: Optional[List[str]] = None,
+              has_website: Optional[bool] = None,
+              can_claim: Optional[bool] = None,
+              has_phone: Optional[bool] = None,
+              min_rating: Optional[float] = None,
+              max_rating: Optional[float] = None,
+              sort: Optional[List[str]] = DEFAULT_SORT,
+              max: Optional[int] = None,
+              convert_to_english: bool = True,
+              fields: Optional[List[str]] = DEFAULT_FIELDS,
+              parquet: bool = False,
+              processes: Optional[int] = 1) -> List[Dict]:
+        """
+        Function to extract the places archived by Gmaps.places or Gmaps.links with archive=True again, without fetching them.
+
+        :param output_folder: Name of the folder the output is written to.
+        :param links: List of Google Maps place links to extract, or None to extract every archived place.
+        :param min_reviews: Minimum number of reviews a place should have.
+        :param max_reviews: Maximum number of reviews a place should have.
+        :param category_in: List of categories the places should belong to.
+        :param has_website: Boolean indicating if the place should have a website.
+        :param can_claim: Boolean indicating if the place can be claim.
+        :param has_phone: Boolean indicating if the place should have a phone number.
+        :param min_rating: Minimum rating of the places.
+        :param max_rating: Maximum rating of the places.
+        :param sort: Sort criteria for the results.
+        :param max: Maximum number of results to return.
+        :param convert_to_english: Boolean indicating whether to convert non-English characters to English characters.
+        :param fields: List of fields to return in the result.
+        :param parquet: Boolean indicating whether to also write the places as a Parquet file, which needs the pyarrow package.
+        :param processes: Number of processes extracting the places, or Gmaps.ALL_CORES to use every core. With 1, the places are extracted in this process.
+        :return: List of dictionaries with the extracted place data.
+        """
+
+        if parquet:
+            import_pyarrow()
+
+        fields = determine_fields(fields, False, False)
+        filter_data = create_filter_data(min_reviews, max_reviews, category_in, has_website, can_claim, has_phone, min_rating, max_rating)
+        extracted_fields = determine_extracted_fields(fields, filter_data, sort, False, False)
+
+        if links is not None and max is not None:
+            links = links[:max]
+
+        archive = StateArchive()
+        batches = ((link_states, extracted_fields, convert_to_english) for link_states in archive.iter_compressed_batches(links))
+
+        places = []
+        failed_links = []
+        try:
+            for batch_places, batch_failed_links in map_in_processes(extract_archived_batch, batches, processes):
+                places.extend(batch_places)
+                failed_links.extend(batch_failed_links)
+                if max is not None and len(places) >= max:
+                    break
+        finally:
+            archive.close()
+
+        if max is not None:
+            places = places[:max]
+
+        if failed_links:
+            print(f"Failed to extract {len(failed_links)} archived places, such as {failed_links[0]}.")
+        if links is not None:
+            not_archived = len(links) - len(places) - len(failed_links)
+            if not_archived > 0:
+                print(f"{not_archived} of the links are not archived. Scrape them with Gmaps.links(archive=True) to archive them.")
+
+        places_obj = {"query": output_folder, "places": places}
+        return process_result(min_reviews, max_reviews, category_in, has_website, can_claim, has_phone, min_rating, max_rating, sort, None, False, None, None, fields, None, False, convert_to_english, False, places_obj, parquet)
@@ -0,0 +1,108 @@
+import os
+import sqlite3
+import threading
+from time import time
+from botasaurus.cache_codecs import GZIP, decode, encode
+from botasaurus.cache_keys import hash_key
+from botasaurus.decorators_utils import create_directory_if_not_exists
+from botasaurus.utils import relative_path
+
+JOURNAL_PATH = 'journal/journal.db'
+
+# Stages a query, or the links of Gmaps.links, go through. Searching a query also fetches the details of its places.
+SEARCHED = "searched"
+DETAILS = "details"
+SOCIALS = "socials"
+REVIEWS = "reviews"
+WRITTEN = "written"
+
+STAGE_ORDER = {
+    SEARCHED: 0,
+    DETAILS: 0,
+    SOCIALS: 1,
+    REVIEWS: 2,
+    WRITTEN: 3,
+}
+
+
+class Journal:
+    """
+    Records the last stage each query of a job has finished, along with its places after that stage,
+    in a sqlite database in WAL mode.
+
+    Running the same job again after a crash continues every query from its last finished stage,
+    including queries whose places were not cached because some of them failed to scrape.
+    A job is identified by its options, so changing a filter or a field starts a new job.
+    """
+
+    def __init__(self, job, path=JOURNAL_PATH):
+        self.job = job
+        self.path = path
+        # sqlite connections can't be shared between threads, and the stages of a pipeline run in their own threads
+        self._local = threading.local()
+        # The connections of every thread, so that close() closes them all
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+    def get_connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            create_directory_if_not_exists(os.path.dirname(self.path) or '.')
+            # Each thread uses its own connection, but close() closes them from the thread calling it
+            connection = sqlite3.connect(relative_path(self.path), timeout=60, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS journal (
+                    job TEXT NOT NULL,
+                    item TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    value BLOB,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (job, item)
+                ) WITHOUT ROWID"""
+            )
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def get(self, item):
+        """Returns a (stage, places_obj) tuple of the last stage item finished, or (None, None)."""
+        row = self.get_connection().execute(
+            "SELECT stage, value FROM journal WHERE job = ? AND item = ?", (self.job, item)
+        ).fetchone()
+        if row is None:
+            return None, None
+        return row[0], decode(row[1])
+
+    def is_done(self, item, stage):
+        row = self.get_connection().execute(
+            "SELECT stage FROM journal WHERE job = ? AND item = ?", (self.job, item)
+        ).fetchone()
+        return row is not None and STAGE_ORDER[row[0]] >= STAGE_ORDER[stage]
+
+    def record(self, item, stage, places_obj):
+        self.get_connection().execute(
+            "INSERT OR REPLACE INTO journal (job, item, stage, value, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (self.job, item, stage, encode(places_obj, GZIP, indent=None), time()),
+        )
+
+    def clear(self):
+        """Forgets the job, once all of its queries are done."""
+        self.get_connection().execute("DELETE FROM journal WHERE job = ?", (self.job,))
+
+    def close(self):
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        # Threads using the journal again open new connections
+        self._local = threading.local()
+
+
+def create_journal(resume, kind, options):
+    """Returns the Journal of the job with the options, or None when the run is not resumable."""
+    if not resume:
+        return None
+    return Journal(kind + ":" + hash_key(options))
@@ -0,0 +1,250 @@
+import csv
+import json
+import os
+from botasaurus.beep_utils import prompt
+from botasaurus.json_codec import dumps
+
+
+def to_csv_value(value):
+    # Like bt.write_csv, nested values are written as JSON
+    if isinstance(value, (dict, list, tuple, set)):
+        return json.dumps(value)
+    return value
+
+
+def open_file(path, mode):
+    while True:
+        try:
+            return open(path, mode, newline='', encoding='utf-8')
+        except PermissionError:
+            prompt(f"{path} is currently open in another application (e.g., Excel). Please close the the Application and press 'Enter' to save.")
+
+
+class CsvSink:
+    """
+    Writes rows to a CSV file as they come.
+
+    The columns are the keys of the rows seen so far. A row with new keys widens the header,
+    which rewrites the file once, so the file ends up with the same columns as bt.write_csv.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fieldnames = []
+        self.known_fieldnames = set()
+        # The header is written with the first row
+        self.file = open_file(path, 'w')
+        self.writer = csv.DictWriter(self.file, fieldnames=self.fieldnames)
+
+    def widen(self, row):
+        new_fieldnames = [key for key in row if key not in self.known_fieldnames]
+        if not new_fieldnames:
+            return
+
+        self.file.close()
+        rows = []
+        if self.fieldnames:
+            with open(self.path, 'r', newline='', encoding='utf-8') as fp:
+                rows = list(csv.DictReader(fp))
+
+        self.fieldnames = self.fieldnames + new_fieldnames
+        self.known_fieldnames.update(new_fieldnames)
+        temp_path = self.path + '.tmp'
+        with open_file(temp_path, 'w') as fp:
+            writer = csv.DictWriter(fp, fieldnames=self.fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(temp_path, self.path)
+
+        self.file = open_file(self.path, 'a')
+        self.writer = csv.DictWriter(self.file, fieldnames=self.fieldnames)
+
+    def write(self, row):
+        if not isinstance(row, dict):
+            return
+        self.widen(row)
+        self.writer.writerow({key: to_csv_value(value) for key, value in row.items()})
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        if not self.fieldnames:
+            # Like bt.write_csv, a file without rows has an empty header
+            self.writer.writeheader()
+        self.file.close()
+
+
+class JsonLinesSink:
+    """Writes every item as a line of a JSON Lines file, which can be read while it is still being written."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open_file(path, 'w')
+
+    def write(self, item):
+        self.file.write(dumps(item) + '\n')
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class JsonArraySink:
+    """Writes the items as a JSON array, the same as bt.write_json, one item at a time."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open_file(path, 'w')
+        self.count = 0
+
+    def write(self, item):
+        # The item as an element of an array indented by 4 spaces
+        item_json = dumps([item], indent=4)[2:-2]
+        self.file.write(('[\n' if self.count == 0 else ',\n') + item_json)
+        self.count += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.write('\n]' if self.count else '[]')
+        self.file.close()
+
+
+# Rows buffered before they are written as a row group of a Parquet file
+ROW_GROUP_SIZE = 10_000
+
+
+def import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError('The Parquet output needs the pyarrow package, install it by running "python -m pip install pyarrow"')
+    return pyarrow
+
+
+def to_json_strings(values):
+    return [None if value is None else json.dumps(value) for value in values]
+
+
+def has_empty_struct(pa, type):
+    if pa.types.is_struct(type):
+        return type.num_fields == 0 or any(has_empty_struct(pa, type.field(index).type) for index in range(type.num_fields))
+    if pa.types.is_list(type) or pa.types.is_large_list(type):
+        return has_empty_struct(pa, type.value_type)
+    return False
+
+
+class ParquetSink:
+    """
+    Writes rows to a Parquet file in row groups, keeping nested values like hours and reviews as nested columns.
+
+    The schema is inferred from the rows. Columns whose values have no common type, like a field which is
+    sometimes a list and sometimes a string, are written as JSON strings. A row group with new columns widens
+    the schema, which rewrites the file once, like the header of CsvSink.
+    """
+
+    def __init__(self, path, row_group_size=ROW_GROUP_SIZE):
+        self.pa = import_pyarrow()
+        self.path = path
+        self.row_group_size = row_group_size
+        self.rows = []
+        self.schema = None
+        self.writer = None
+        self.json_columns = set()
+
+    def to_array(self, name, values):
+        pa = self.pa
+        if name not in self.json_columns:
+            try:
+                array = pa.array(values)
+                # Parquet can't store structs without fields, which empty dicts are inferred as
+                if not has_empty_struct(pa, array.type):
+                    return array
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                pass
+            self.json_columns.add(name)
+        return pa.array(to_json_strings(values), pa.string())
+
+    def to_table(self, rows):
+        names = dict.fromkeys(name for row in rows for name in row)
+        arrays = [self.to_array(name, [row.get(name) for row in rows]) for name in names]
+        return self.pa.Table.from_arrays(arrays, names=list(names))
+
+    def merge_schema(self, schema):
+        pa = self.pa
+        fields = {field.name: field for field in self.schema}
+        for field in schema:
+            current = fields.get(field.name)
+            if current is None:
+                fields[field.name] = field
+            elif not current.type.equals(field.type):
+                try:
+                    fields[field.name] = pa.unify_schemas([pa.schema([current]), pa.schema([field])], promote_options="permissive").field(0)
+                except (pa.ArrowInvalid, pa.ArrowTypeError):
+                    self.json_columns.add(field.name)
+                    fields[field.name] = pa.field(field.name, pa.string())
+        return pa.schema(list(fields.values()))
+
+    def conform(self, table, schema):
+        pa = self.pa
+        arrays = []
+        for field in schema:
+            if field.name not in table.column_names:
+                arrays.append(pa.nulls(table.num_rows, field.type))
+                continue
+            column = table.column(field.name)
+            try:
+                arrays.append(column.cast(field.type))
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                arrays.append(pa.array(to_json_strings(column.to_pylist()), pa.string()))
+        return pa.Table.from_arrays(arrays, schema=schema)
+
+    def open(self, schema):
+        self.schema = schema
+        self.writer = self.pa.parquet.ParquetWriter(self.path, schema)
+
+    def widen(self, schema):
+        # The schema of a Parquet file is written in its footer, so the rows written so far are written again
+        self.writer.close()
+        table = self.pa.parquet.read_table(self.path)
+        self.open(schema)
+        self.writer.write_table(self.conform(table, schema))
+
+    def write_row_group(self):
+        if not self.rows:
+            return
+        table = self.to_table(self.rows)
+        self.rows = []
+
+        if self.writer is None:
+            self.open(table.schema)
+        elif not table.schema.equals(self.schema):
+            schema = self.merge_schema(table.schema)
+            if not schema.equals(self.schema):
+                self.widen(schema)
+            table = self.conform(table, self.schema)
+        self.writer.write_table(table)
+
+    def write(self, row):
+        if not isinstance(row, dict):
+            return
+        self.rows.append(row)
+        if len(self.rows) >= self.row_group_size:
+            self.write_row_group()
+
+    def flush(self):
+        # A Parquet file can only be read once its footer is written on close,
+        # so rows are kept until a full row group is buffered.
+        pass
+
+    def close(self):
+        self.write_row_group()
+        if self.writer is None:
+            self.open(self.pa.schema([]))
+        self.writer.close()
+
@@ -0,0 +1,153 @@
+import sys
+from queue import Empty, Full, Queue
+from threading import Semaphore, Thread
+from botasaurus.decorators import ThreadWithResult
+
+DEFAULT_QUEUE_SIZE = 2
+
+# Marks the end of the items flowing through a stage queue.
+_DONE = object()
+
+
+def _put(queue: Queue, item, consumer):
+    # Don't block forever if the consumer stage has crashed.
+    while consumer.is_alive():
+        try:
+            queue.put(item, timeout=0.1)
+            return True
+        except Full:
+            pass
+    return False
+
+
+def _join(thread):
+    try:
+        # Must see https://stackoverflow.com/questions/4136632/how-to-kill-a-child-thread-with-ctrlc
+        while thread.is_alive():
+            thread.join(0.1)
+    except KeyboardInterrupt:
+        sys.exit(1)
+    thread.join()
+
+
+def run_pipeline(items, stages, queue_size=DEFAULT_QUEUE_SIZE):
+    """
+    Runs every item through the stages in order, overlapping the stages across items.
+
+    The first stage runs in the calling thread, every other stage in its own thread.
+    Stages are connected by bounded queues, so a fast stage can only run `queue_size`
+    items ahead of the next one. Results are returned in the order of `items`.
+
+    :param items: The items to feed into the first stage.
+    :param stages: List of callables, each receiving the output of the previous stage.
+    :param queue_size: Maximum number of items waiting between two stages.
+    :return: List with the output of the last stage for every item.
+    """
+    result = []
+    queues = [Queue(maxsize=queue_size) for _ in stages[1:]]
+    threads = []
+
+    def create_worker(stage, in_queue, out_queue, consumer):
+        def worker():
+            try:
+                while True:
+                    item = in_queue.get()
+                    if item is _DONE:
+                        break
+
+                    output = stage(item)
+                    if out_queue is None:
+                        result.append(output)
+                    elif not _put(out_queue, output, consumer):
+                        break
+            finally:
+                if out_queue is not None:
+                    _put(out_queue, _DONE, consumer)
+        return worker
+
+    # Start from the last stage, so every worker knows the thread consuming its output.
+    consumer = None
+    for index in reversed(range(len(queues))):
+        out_queue = queues[index + 1] if index + 1 < len(queues) else None
+        thread = ThreadWithResult(target=create_worker(stages[index + 1], queues[index], out_queue, consumer), daemon=True)
+        thread.start()
+        threads.insert(0, thread)
+        consumer = thread
+
+    first_stage = stages[0]
+    if not threads:
+        return [first_stage(item) for item in items]
+
+    try:
+        for item in items:
+            if not _put(queues[0], first_stage(item), threads[0]):
+                break
+    finally:
+        _put(queues[0], _DONE, threads[0])
+
+    for thread in threads:
+        # Raises the exception of a crashed stage
+        _join(thread)
+
+    return result
+
+
+def iter_in_parallel(fn, items, n_workers):
+    """
+    Yields (index, fn(item)) for every item of items, in the order they finish, running fn on n_workers items at a time.
+
+    Every worker takes the next item as soon as its result is consumed, so a slow item only holds up its own worker,
+    rather than every worker waiting for the slowest item of a batch.
+
+    :param fn: Called with each item in a worker thread. Its exception is raised to the caller.
+    :param n_workers: Number of items fn runs on at a time.
+    """
+    item_queue = Queue()
+    for indexed_item in enumerate(items):
+        item_queue.put(indexed_item)
+    n_items = item_queue.qsize()
+
+    results = Queue()
+    # A worker holds a slot while running an item and until its result is consumed
+    slots = Semaphore(n_workers)
+
+    def worker():
+        while True:
+            slots.acquire()
+            try:
+                index, item = item_queue.get_nowait()
+            except Empty:
+                slots.release()
+                return
+
+            try:
+                results.put((index, fn(item), None))
+            except Exception as e:
+                results.put((index, None, e))
+
+    for _ in range(min(n_workers, n_items)):
+        Thread(target=worker, daemon=True).start()
+
+    try:
+        for _ in range(n_items):
+            while True:
+                try:
+                    # Times out so that KeyboardInterrupt is not blocked
+                    index, result, error = results.get(timeout=0.1)
+                    break
+                except Empty:
+                    pass
+
+            if error is not None:
+                raise error
+            yield index, result
+            slots.release()
+    finally:
+        # The workers stop after their current item when the caller stops early or fails
+        while True:
+            try:
+                item_queue.get_nowait()
+            except Empty:
+                break
+        for _ in range(n_workers):
+            slots.release()
@@ -0,0 +1,92 @@
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+def create_process_pool(processes):
+    # The processes are spawned rather than forked, as forking a process with threads running, like the ones
+    # fetching places and driving browsers, can deadlock the child on a lock another thread held.
+    return ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn"))
+
+
+def determine_processes(processes):
+    if processes is None:
+        return os.cpu_count() or 1
+    return max(1, int(processes))
+
+
+def map_in_processes(fn, items, processes=None, max_pending=None):
+    """
+    Yields fn(item) for every item, in the order of items, running fn in a pool of processes.
+
+    Items are only submitted as the results are consumed, so at most max_pending items, 2 per process
+    by default, are held at once however many items there are. With a single process, fn runs in the
+    calling process, as starting a pool would only add the cost of sending the items to it.
+
+    :param fn: A function the processes can import, so defined at the top level of a module.
+    :param processes: Number of processes, None for one per core.
+    """
+    processes = determine_processes(processes)
+    if processes == 1:
+        for item in items:
+            yield fn(item)
+        return
+
+    max_pending = max_pending or processes * 2
+    with create_process_pool(processes) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+# The shared pools, by their number of processes
+_shared_pools = {}
+_shared_pool_lock = threading.Lock()
+
+
+def get_shared_pool(processes):
+    with _shared_pool_lock:
+        pool = _shared_pools.get(processes)
+        if pool is None:
+            pool = _shared_pools[processes] = create_process_pool(processes)
+        return pool
+
+
+def reset_shared_pool(pool):
+    with _shared_pool_lock:
+        for processes, shared_pool in list(_shared_pools.items()):
+            if shared_pool is pool:
+                del _shared_pools[processes]
+    pool.shutdown(wait=False)
+
+
+def run_in_shared_pool(fn, *args, processes=None):
+    """
+    Runs fn(*args) in a pool of processes, shared by every thread of this process, and returns its result.
+
+    Threads which fetch pages hand it their CPU heavy work and wait for it without holding the GIL,
+    so the work of many threads runs on as many cores rather than one thread at a time.
+    With a single process, fn runs in the calling thread.
+
+    :param fn: A function the processes can import, so defined at the top level of a module.
+    :param processes: Number of processes of the pool, None for one per core.
+    """
+    processes = determine_processes(processes)
+    if processes == 1:
+        return fn(*args)
+
+    pool = get_shared_pool(processes)
+    try:
+        return pool.submit(fn, *args).result()
+    except BrokenProcessPool:
+        # A process which dies, like when running out of memory, breaks the pool for every thread,
+        # so the next call starts a new one.
+        reset_shared_pool(pool)
+        raise
@@ -6,8 +6,7 @@ from datetime import datetime
 import time
 import math
 import urllib.parse
-from lxml import html
-from bs4 import BeautifulSoup, Tag
+from lxml import etree, html
 import regex as re
 import re as rex
 from .time_utils import parse_relative_date
@@ -102,6 +101,132 @@ def extract_reviews_and_photos(text):
     # Return the extracted numbers as a tuple
     return (num_reviews, num_photos)
 
+
+# Tags whose strings BeautifulSoup types apart, leaving them out of the text of the tags around them
+STRING_CONTAINERS = {"rt", "rp", "style", "script", "template"}
+
+
+def get_string_container(element):
+    for ancestor in (element, *element.iterancestors()):
+        if ancestor.tag in STRING_CONTAINERS:
+            return ancestor.tag
+    return None
+
+
+def _iter_contained_strings(element, container, wanted):
+    if element.text and container == wanted:
+        yield element.text
+    for child in element:
+        # Comments and processing instructions only have their tail in the text
+        if isinstance(child.tag, str):
+            yield from _iter_contained_strings(child, child.tag if child.tag in STRING_CONTAINERS else container, wanted)
+        if child.tail and container == wanted:
+            yield child.tail
+
+
+def iter_strings(element):
+    """Yields the strings BeautifulSoup joins into the text of element, in document order."""
+    container = get_string_container(element)
+    if container is None and next(element.iter(*STRING_CONTAINERS), None) is None:
+        return element.itertext()
+    return _iter_contained_strings(element, container, element.tag if element.tag in STRING_CONTAINERS else None)
+
+
+def get_text(element):
+    """The text of element, like BeautifulSoup's Tag.text."""
+    return "".join(iter_strings(element))
+
+
+def iter_stripped_strings(element):
+    """Like BeautifulSoup's Tag.stripped_strings."""
+    for string in iter_strings(element):
+        string = string.strip()
+        if string:
+            yield string
+
+
+def iter_contents(element):
+    """Yields the children of element, along with the strings between them, like BeautifulSoup's Tag.contents."""
+    if element.text:
+        yield element.text
+    for child in element:
+        yield child
+        if child.tail:
+            yield child.tail
+
+
+def is_tag(node):
+    # Comments and processing instructions are elements in lxml, but not tags in BeautifulSoup
+    return not isinstance(node, str) and isinstance(node.tag, str)
+
+
+def class_selector(class_name):
+    """
+    Selects the elements BeautifulSoup's find(True, class_=class_name) finds, which have class_name among their
+    classes, or as all of their classes when class_name has several.
+    """
+    if " " in class_name:
+        return (
+            f"normalize-space(@class) = '{class_name}'",
+            lambda element, class_names: " ".join(class_names) == class_name,
+        )
+    return (
+        f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')",
+        lambda element, class_names: class_name in class_names,
+    )
+
+
+def attribute_selector(attribute, value=True):
+    """Selects the elements with attribute, or with attribute equal to value, like BeautifulSoup's find(True, {attribute: value})."""
+    if value is True:
+        return f"@{attribute}", lambda element, class_names: element.get(attribute) is not None
+    return f"@{attribute} = '{value}'", lambda element, class_names: element.get(attribute) == value
+
+
+# The elements of a review _parse_review reads
+REVIEW_SELECTORS = {
+    "full_text": class_selector("review-full-text"),
+    "expandable_section": attribute_selector("data-expandable-section"),
+    "rating": class_selector("lTi8oc z3HNkc"),
+    "other_ratings": class_selector("k8MTF"),
+    "relative_date": class_selector("dehysf lTi8oc"),
+    "user_name": class_selector("TSUbDb"),
+    "user": class_selector("Msppse"),
+    "review_link": class_selector("RvU3D"),
+    "likes": attribute_selector("jsname", "CMh1ye"),
+    "response": class_selector("d6SCIc"),
+    "response_date": class_selector("pi8uOe"),
+    "trip_type_travel_group": class_selector("PV7e7"),
+}
+
+# Every element any selector selects, in document order, in a single traversal of the review
+REVIEW_NODES_XPATH = etree.XPath(".//*[" + " or ".join(predicate for predicate, _ in REVIEW_SELECTORS.values()) + "]")
+METADATA_NODE_XPATH = etree.XPath("//*[@data-google-review-count]")
+REVIEWS_XPATH = etree.XPath("//*[" + class_selector("gws-localreviews__google-review")[0] + "]")
+LOCAL_GUIDE_XPATH = etree.XPath(".//*[" + class_selector("QV3IV")[0] + "]")
+
+
+def select_review_nodes(review):
+    """Returns the elements of review each of REVIEW_SELECTORS selects, in document order."""
+    selected = {name: [] for name in REVIEW_SELECTORS}
+    for element in REVIEW_NODES_XPATH(review):
+        class_value = element.get("class")
+        class_names = class_value.split() if class_value else ()
+        for name, (_, matches) in REVIEW_SELECTORS.items():
+            if matches(element, class_names):
+                selected[name].append(element)
+    return selected
+
+
+def first(elements):
+    return elements[0] if elements else None
+
+
+def find_by_class(element, class_name):
+    """Like BeautifulSoup's find(True, class_=class_name), for elements only looked for once per page."""
+    return first(element.xpath(".//*[" + class_selector(class_name)[0] + "]"))
+
+
 class GoogleMapsAPIScraper:
     def __init__(
         self,
@@ -171,33 +296,25 @@ class GoogleMapsAPIScraper:
         return "<html><body>" + text + "</body></html>"
 
     def _format_response_text(self, response_text: str):
-        """Transforms text into soup and extract list of reviews"""
-        response_soup = reviews_soup = review_count = next_token = None
+        """Parses text into a tree, once, and extract list of reviews"""
+        tree = reviews_tree = review_count = next_token = None
         try:
-            # Send page to soup and trees
-            response_soup = BeautifulSoup(response_text, "lxml")
             tree = html.document_fromstring(response_text)
             # bt.write_html(response_text , "fff.html")
             # Encontrando número de reviews e token de próxima página
-            metadata_node = tree.xpath("//*[@data-google-review-count]")[0]
+            metadata_node = METADATA_NODE_XPATH(tree)[0]
             review_count = int(metadata_node.attrib["data-google-review-count"])
             next_token = metadata_node.attrib["data-next-page-token"]
 
             # Iterando sobre texto de cada review
-            # reviews_tree = tree.xpath('//*[contains(@class, "gws-localreviews__google-review")]')
-            
-            reviews_soup = response_soup.find_all(True, class_="gws-localreviews__google-review")
-            
-            # reviews_soup = [
-            #     response_soup.find("div", dict(r.attrib)) for r in reviews_tree
-            # ]
+            reviews_tree = REVIEWS_XPATH(tree)
         except Exception as e:
             tb = re.sub(r"\s", " ", traceback.format_exc())  # Corrected
             
             if next_token is None:
                 next_token = self._get_response_token(response_text)
         
-        return response_text, response_soup, reviews_soup, review_count, next_token
+        return response_text, tree, reviews_tree, review_count, next_token
 
     def _get_response_token(self, response_text: str) -> str:
         """Searches for token in response text using regex, in case other methods fail"""
@@ -214,7 +331,7 @@ class GoogleMapsAPIScraper:
         sort_by_id: int = "",
         associated_topic: str = "",
         token: str = "",
-    ) -> Tuple[BeautifulSoup, List[BeautifulSoup], int, str]:
+    ) -> Tuple[str, html.HtmlElement, List[html.HtmlElement], int, str]:
         """Makes and formats get request in google's api"""
         query = f"https://www.google.com/async/reviewSort?authuser=0&hl={hl}&yv=3&cs=1&async=feature_id:{feature_id},review_source:All%20reviews,sort_by:{sort_by_id},is_owner:false,filter_text:,associated_topic:,next_page_token:{token},_pms:s,_fmt:pc"
         # query = (
@@ -241,28 +358,28 @@ class GoogleMapsAPIScraper:
 
     def _parse_place(
         self,
-        response: BeautifulSoup,
+        response: html.HtmlElement,
     ) -> dict:
         """Parse place html"""
         metadata = metadata_default.copy()
         return metadata
         # Parse place_name
         try:
-            metadata["place_name"] = response.find(True, class_="P5Bobd").text
+            metadata["place_name"] = get_text(find_by_class(response, "P5Bobd"))
         except Exception as e:
             pass
             
 
         # Parse address
         try:
-            metadata["address"] = response.find(True, class_="T6pBCe").text
+            metadata["address"] = get_text(find_by_class(response, "T6pBCe"))
         except Exception as e:
             pass    
             
 
         # Parse overall_rating
         try:
-            rating_text = response.find(True, class_="Aq14fc").text.replace(",", ".")
+            rating_text = get_text(find_by_class(response, "Aq14fc")).replace(",", ".")
             metadata["overall_rating"] = float(rating_text)
         except Exception as e:
             pass
@@ -270,7 +387,7 @@ class GoogleMapsAPIScraper:
 
         # Parse n_reviews
         try:
-            n_reviews_text = response.find(True, class_="z5jxId").text
+            n_reviews_text = get_text(find_by_class(response, "z5jxId"))
             n_reviews_text = re.sub("[.]|,| reviews| comentários", "", n_reviews_text)
             metadata["n_reviews"] = int(n_reviews_text)
         except Exception as e:
@@ -279,8 +396,8 @@ class GoogleMapsAPIScraper:
 
         # Parse topics
         try:
-            topics = response.find("localreviews-place-topics")
-            s = " ".join([s for s in topics.stripped_strings])
+            topics = first(response.xpath(".//localreviews-place-topics"))
+            s = " ".join([s for s in iter_stripped_strings(topics)])
             metadata["topics"] = re.sub(r"\s+", " ", s)  # Corrected
         except Exception as e:
             pass
@@ -292,10 +409,10 @@ class GoogleMapsAPIScraper:
     def _parse_review_text(self, text_block) -> str:
         """Parse review text html, removing unwanted characters"""
         text = ""
-        for e, s in zip(text_block.contents, text_block.stripped_strings):
-            if isinstance(e, Tag) and e.has_attr(
+        for e, s in zip(iter_contents(text_block), iter_stripped_strings(text_block)):
+            if is_tag(e) and e.get(
                 "class"
-            ):  #  and e.attrs["class"] in ["review-snippet","k8MTF",]:
+            ) is not None:  #  and e.attrs["class"] in ["review-snippet","k8MTF",]:
                 break
             text += s + " "
 
@@ -316,7 +433,7 @@ class GoogleMapsAPIScraper:
         with open(
             f"errors/review_{name}_{self._ts()}.html", "w", encoding="utf-8"
         ) as f:
-            f.writelines(str(review) + "\n\n" + msg)
+            f.writelines(html.tostring(review, encoding="unicode", with_tail=False) + "\n\n" + msg)
         return result
 
     def _handle_place_exception(self, response_text, name, n) -> dict:
@@ -333,28 +450,31 @@ class GoogleMapsAPIScraper:
             f.writelines(str(response_text) + "\n\n" + msg)
 
 
-    def _parse_review(self, review: Tag, hl) -> dict:
+    def _parse_review(self, review: html.HtmlElement, hl) -> dict:
         result = review_default_result.copy()
 
         # Make timestamp
         result["retrieval_date"] = str(datetime.now())
 
+        # Find every node read below in one pass
+        nodes = select_review_nodes(review)
+
         # Parse text
         try:
             # Find text block
-            text_block = review.find(True, class_="review-full-text")
-            if not text_block:
-                text_block = review.find(True, {"data-expandable-section": True})
+            text_block = first(nodes["full_text"])
+            if text_block is None:
+                text_block = first(nodes["expandable_section"])
             # Extract text
-            if text_block:
+            if text_block is not None:
                 result["text"] = self._parse_review_text(text_block)
         except Exception as e:
             self._handle_review_exception(result, review, "text")
         try:
             # Find text block
-            translated_text = review.find_all(True, class_="review-full-text")
+            translated_text = nodes["full_text"]
             if not translated_text:
-                translated_text = review.find_all(True, {"data-expandable-section": True})
+                translated_text = nodes["expandable_section"]
             # Extract text
             # print(text_block)
             if len(translated_text) > 1:
@@ -365,7 +485,7 @@ class GoogleMapsAPIScraper:
 
         # Parse review rating
         try:
-            rating_text = review.find(True, class_="lTi8oc z3HNkc").get("aria-label")
+            rating_text = first(nodes["rating"]).get("aria-label")
             rating_text = re.sub(",", ".", rating_text)
             rating = re.findall("[0-9]+[.][0-9]*", rating_text)
             result["rating"] = float(rating[0])
@@ -376,34 +496,34 @@ class GoogleMapsAPIScraper:
 
         # Parse other ratings
         try:
-            other_ratings = review.find(True, class_="k8MTF")
-            if other_ratings:
-                s = " ".join([s for s in other_ratings.stripped_strings])
+            other_ratings = first(nodes["other_ratings"])
+            if other_ratings is not None:
+                s = " ".join([s for s in iter_stripped_strings(other_ratings)])
                 result["other_ratings"] = re.sub(r"\s+", " ", s)
         except Exception as e:
             self._handle_review_exception(result, review, "other_ratings")
 
         # Parse relative date
         try:
-            result["relative_date"] = review.find(True, class_="dehysf lTi8oc").text
+            result["relative_date"] = get_text(first(nodes["relative_date"]))
         except Exception as e:
             self._handle_review_exception(result, review, "relative_date")
 
         # Parse user name
         try:
-            result["user_name"] = review.find(True, class_="TSUbDb").text
+            result["user_name"] = get_text(first(nodes["user_name"]))
         except Exception as e:
             self._handle_review_exception(result, review, "user_name")
 
         # Parse user metadata
         try:
-            user_node = review.find(True, class_="Msppse")
-            if user_node:
+            user_node = first(nodes["user"])
+            if user_node is not None:
                 result["user_url"] = user_node.get("href")
                 result["user_is_local_guide"] = (
-                    True if user_node.find(True, class_="QV3IV") else False
+                    True if LOCAL_GUIDE_XPATH(user_node) else False
                 )
-                fixed_text = user_node.text.replace(",", "").replace(".", "")
+                fixed_text = get_text(user_node).replace(",", "").replace(".", "")
                 user_reviews,user_photos =  extract_reviews_and_photos(fixed_text)
                 result["user_reviews"] = user_reviews
                 result["user_photos"] = user_photos
@@ -421,32 +541,32 @@ class GoogleMapsAPIScraper:
         # Parse review id
         try:
             # result["review_id"] = review.find(True, {"data-ri": True}).get("data-ri")
-            review_id = review.find(True, class_="RvU3D").get("href")
+            review_id = first(nodes["review_link"]).get("href")
             result["review_id"] = re.findall("(?<=postId=).*?(?=&)", review_id)[0]
         except Exception as e:
             self._handle_review_exception(result, review, "review_id")
 
         # Parse review likes
         try:
-            review_likes = review.find(True, jsname="CMh1ye")
-            if review_likes:
-                result["likes"] = int(review_likes.text)
+            review_likes = first(nodes["likes"])
+            if review_likes is not None:
+                result["likes"] = int(get_text(review_likes))
         except Exception as e:
             self._handle_review_exception(result, review, "likes")
 
         # Parse review response
         try:
-            response = review.find(True, class_="d6SCIc")
-            if response:
+            response = first(nodes["response"])
+            if response is not None:
                 result["response_text"] = self._parse_review_text(response)
-            response_date = review.find(True, class_="pi8uOe")
-            if response_date:
-                result["response_relative_date"] = response_date.text
+            response_date = first(nodes["response_date"])
+            if response_date is not None:
+                result["response_relative_date"] = get_text(response_date)
         except Exception as e:
             self._handle_review_exception(result, review, "response")
 
         try:
-            response = review.find_all(True, class_="d6SCIc")
+            response = nodes["response"]
             if response:
                 result["translated_response_text"] = self._parse_review_text(response[1])
         except Exception as e:
@@ -454,9 +574,9 @@ class GoogleMapsAPIScraper:
 
         # Parse trip_type_travel_group
         try:
-            trip_type_travel_group = review.find(True, class_="PV7e7")
-            if trip_type_travel_group:
-                s = " ".join([s for s in trip_type_travel_group.stripped_strings])
+            trip_type_travel_group = first(nodes["trip_type_travel_group"])
+            if trip_type_travel_group is not None:
+                s = " ".join([s for s in iter_stripped_strings(trip_type_travel_group)])
                 result["trip_type_travel_group"] = re.sub(r"\s+", " ", s)  # Corrected
         except Exception as e:
             self._handle_review_exception(result, review, "trip_type_travel_group")
@@ -525,8 +645,8 @@ class GoogleMapsAPIScraper:
 
                     (
                         response_text,
-                        response_soup,
-                        reviews_soup,
+                        response_tree,
+                        reviews_tree,
                         review_count,
                         next_token,
                     ) = self._get_request(
@@ -536,7 +656,7 @@ class GoogleMapsAPIScraper:
                         token=token,
                     )
                     
-                    assert isinstance(reviews_soup, list)
+                    assert isinstance(reviews_tree, list)
                     break
                 except Exception as e:
                     # traceback.print_exc()
@@ -556,8 +676,8 @@ class GoogleMapsAPIScraper:
                 continue
 
             try:
-                # print("reviews_soup", len(reviews_soup))
-                for review in reviews_soup:
+                # print("reviews_tree", len(reviews_tree))
+                for review in reviews_tree:
                     # 
                     result = self._parse_review(review, hl)
                     result["token"] = token
@@ -600,11 +720,11 @@ class GoogleMapsAPIScraper:
         feature_id = self._parse_url_to_feature_id(url)
 
         
-        _, response_soup, _, _, _ = self._get_request(
+        _, response_tree, _, _, _ = self._get_request(
             feature_id,
             hl=hl,
         )
-        metadata = self._parse_place(response=response_soup)
+        metadata = self._parse_place(response=response_tree)
         metadata["feature_id"] = feature_id
         metadata["url"] = url
         metadata["name"] = name
@@ -617,10 +737,10 @@ class GoogleMapsAPIScraper:
 if __name__ == "__main__":
     try:
         with GoogleMapsAPIScraper() as scraper:
-            response_text, response_soup, reviews_soup, review_count, next_token = scraper._format_response_text(bt.read_html("fff"))
+            response_text, response_tree, reviews_tree, review_count, next_token = scraper._format_response_text(bt.read_html("fff"))
             rs = []
-            # for review in reviews_soup[:1]:
-            for review in reviews_soup:
+            # for review in reviews_tree[:1]:
+            for review in reviews_tree:
                 result = scraper._parse_review(review, "es")
                 rs.append(result)
 
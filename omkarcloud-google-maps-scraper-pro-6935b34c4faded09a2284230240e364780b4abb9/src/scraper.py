@@ -1,10 +1,12 @@
 from botasaurus import *
 from hashlib import md5
 from botasaurus import cl
-from botasaurus.cache import DontCache
-from src.extract_data import extract_data, perform_extract_possible_map_link
+from botasaurus.cache import Cache, DontCache
+from src.archive import get_archive
+from src.process_pool import run_in_shared_pool
+from src.extract_data import extract_data, get_initialization_state, perform_extract_possible_map_link
 from src.scraper_utils import create_search_link, perform_visit
-from src.utils import convert_unicode_dict_to_ascii_dict, unique_strings
+from src.utils import convert_unicode_dict_to_ascii_dict
 from .reviews_scraper import GoogleMapsAPIScraper
 from time import sleep, time
 from botasaurus.utils import retry_if_is_error
@@ -76,15 +78,6 @@ def scrape_reviews(requests: AntiDetectRequests, data):
     return {"place_id":place_id, "reviews": processed}
 
 
-cookies = None
-def get_cookies():
-         global cookies
-         return cookies
-
-def set_cookies(ck):
-         global cookies
-         cookies = ck
-
 @request(
     parallel=5,
     async_queue=True,
@@ -99,18 +92,21 @@ def set_cookies(ck):
     # request_interval=0.2, {ADD}
 
 )
-def scrape_place(requests: AntiDetectRequests, link):
-        cookies = get_cookies()
+def scrape_place(requests: AntiDetectRequests, data, metadata=None):
+        # The cookies, whether to archive the state and the processes extracting it, are passed as metadata by the browser
+        # that found the link, so parallel browsers don't share them, and the cache key stays the link.
+        metadata = metadata or {"cookies": None, "archive": False, "processes": 1}
+        link, fields = (data, None) if isinstance(data, str) else (data["link"], data["fields"])
         try:
-            html =  requests.get(link,cookies=cookies).text
-            # Splitting HTML to get the part after 'window.APP_INITIALIZATION_STATE='
-            initialization_state_part = html.split(';window.APP_INITIALIZATION_STATE=')[1]
-
-            # Further splitting to isolate the APP_INITIALIZATION_STATE content
-            app_initialization_state = initialization_state_part.split(';window.APP_FLAGS')[0]
-
-            # Extracting data from the APP_INITIALIZATION_STATE
-            data = extract_data(app_initialization_state, link)
+            html =  requests.get(link,cookies=metadata["cookies"]).text
+            # The APP_INITIALIZATION_STATE content, between ';window.APP_INITIALIZATION_STATE=' and ';window.APP_FLAGS'
+            app_initialization_state = get_initialization_state(html)
+            if metadata["archive"]:
+                get_archive().put(link, app_initialization_state)
+
+            # Extracting data from the APP_INITIALIZATION_STATE, in a process when there are many, as decoding it
+            # would hold the GIL the threads fetching the other places need.
+            data = run_in_shared_pool(extract_data, app_initialization_state, link, fields, processes=metadata["processes"])
             # data['link'] = link
 
             data['is_spending_on_ads'] = False
@@ -122,13 +118,21 @@ def scrape_place(requests: AntiDetectRequests, link):
             sleep(63)
             raise
 
+def create_place_metadata(driver, archive, processes):
+    return {"cookies": driver.get_cookies_dict(), "archive": archive, "processes": processes}
+
+def create_place_links_data(links, fields):
+    # Places extracted with only some of the fields are cached apart from the ones with every field,
+    # which keep their link as the cache key. The fields are a tuple, as the queue hashes the items put in it.
+    if fields is None:
+        return links
+    fields = tuple(fields)
+    return [{"link": link, "fields": fields} for link in links]
+
 def extract_possible_map_link(html):
         try:
-            # Splitting HTML to get the part after 'window.APP_INITIALIZATION_STATE='
-            initialization_state_part = html.split(';window.APP_INITIALIZATION_STATE=')[1]
-
-            # Further splitting to isolate the APP_INITIALIZATION_STATE content
-            app_initialization_state = initialization_state_part.split(';window.APP_FLAGS')[0]
+            # The APP_INITIALIZATION_STATE content, between ';window.APP_INITIALIZATION_STATE=' and ';window.APP_FLAGS'
+            app_initialization_state = get_initialization_state(html)
             # Extracting data from the APP_INITIALIZATION_STATE
             link = perform_extract_possible_map_link(app_initialization_state,)
             # print(link)
@@ -137,7 +141,16 @@ def extract_possible_map_link(html):
         except:
             return None
 
+FEED_LINKS_SELECTOR = '[role="feed"] >  div > div > a'
+
+def get_feed_links(driver: AntiDetectDriver, only_new=False):
+    # Gets the [link, is_sponsored] pairs of the feed in a single script call.
+    if not driver.wait_for_selector(FEED_LINKS_SELECTOR, bt.Wait.LONG):
+        return []
+    return driver.execute_file('get_feed_links.js', FEED_LINKS_SELECTOR, only_new)
+
 def merge_sponsored_links(places, sponsored_links):
+    sponsored_links = set(sponsored_links)
     for place in places:
         place['is_spending_on_ads'] = place['link'] in sponsored_links
 
@@ -168,15 +181,14 @@ def add_arguments(data, options):
 def scrape_places_by_links(driver: AntiDetectDriver, data):
     # get's the cookies accepted which scraper needs.
     driver.get_google(True)
-    set_cookies(driver.get_cookies_dict())
 
     links = data["links"]
     cache = data["cache"]
     
-    scrape_place_obj: AsyncQueueResult = scrape_place(cache=cache)
+    scrape_place_obj: AsyncQueueResult = scrape_place(cache=cache, metadata=create_place_metadata(driver, data.get("archive", False), data.get("processes", 1)))
     convert_to_english = data['convert_to_english']
 
-    scrape_place_obj.put(links)
+    scrape_place_obj.put(create_place_links_data(links, data.get("fields")))
     places = scrape_place_obj.get()
 
     hasnone = False
@@ -219,16 +231,29 @@ def scrape_places(driver: AntiDetectDriver, data):
     max_results = data['max']
     is_spending_on_ads = data['is_spending_on_ads']
     convert_to_english = data['convert_to_english']
+    fields = data.get('fields')
+    archive = data.get('archive', False)
+    processes = data.get('processes', 1)
 
-    scrape_place_obj: AsyncQueueResult = scrape_place()
-
-    sponsored_links = None
+    # Sponsored links seen while scrolling the feed
+    sponsored_links = set()
     def get_sponsored_links():
-         nonlocal sponsored_links
-         if sponsored_links is None:
-              sponsored_links = driver.execute_file('get_sponsored_links.js')
-         return sponsored_links
+         return list(sponsored_links)
+
+    # Links already put, the feed only returns the links it has not returned before
+    seen_links = set()
+    def get_new_links():
+         new_links = []
+         for link, is_sponsored in get_feed_links(driver, only_new=True):
+              if is_sponsored:
+                   sponsored_links.add(link)
 
+              if link in seen_links or (max_results is not None and len(seen_links) >= max_results):
+                   continue
+
+              seen_links.add(link)
+              new_links.append(link)
+         return new_links
 
 
     def put_links():
@@ -244,33 +269,26 @@ def scrape_places(driver: AntiDetectDriver, data):
                             link = extract_possible_map_link(driver.page_source)
                             if link:
                                 rst = [link]
-                                scrape_place_obj.put(rst)
+                                scrape_place_obj.put(create_place_links_data(rst, fields))
                             rst = []
                         elif driver.is_in_page("/maps/place/"):
                             rst = [driver.current_url]
-                            scrape_place_obj.put(rst)
+                            scrape_place_obj.put(create_place_links_data(rst, fields))
                         return
                     else:
                         did_element_scroll = driver.scroll_element(el)
 
-                        links = None
-                        
-                        if max_results is None:
-                            links = driver.links(
-                                '[role="feed"] >  div > div > a', bt.Wait.LONG)
-                        else:
-                            links = unique_strings(driver.links(
-                                '[role="feed"] >  div > div > a', bt.Wait.LONG))[:max_results]
-                                                    
+                        new_links = get_new_links()
                         
                         if is_spending_on_ads:
-                            scrape_place_obj.put(get_sponsored_links())
+                            scrape_place_obj.put(create_place_links_data(get_sponsored_links(), fields))
                             return 
                             
-                        scrape_place_obj.put(links)
+                        if new_links:
+                            scrape_place_obj.put(create_place_links_data(new_links, fields))
 
 
-                        if max_results is not None and len(links) >= max_results:
+                        if max_results is not None and len(seen_links) >= max_results:
                             return
 
                         # TODO: If Proxy is Given Wait for None, and only use wait to Make it Faster, Example Code 
@@ -303,7 +321,7 @@ def scrape_places(driver: AntiDetectDriver, data):
     
     perform_visit(driver, search_link)
     
-    set_cookies(driver.get_cookies_dict())
+    scrape_place_obj: AsyncQueueResult = scrape_place(metadata=create_place_metadata(driver, archive, processes))
     
     STALE_RETRIES = 5
     # TODO
@@ -367,6 +385,10 @@ def scrape_places(driver: AntiDetectDriver, data):
 
     return result 
 
+# Archiving the places fetched, or extracting them in processes, doesn't change them, so they share the cache of a run without it
+Cache.set_ignored_key_fields(scrape_places, ["archive", "processes"])
+Cache.set_ignored_key_fields(scrape_places_by_links, ["archive", "processes"])
+
 # python -m src.scraper
 if __name__ == "__main__":
     # 6 27 
@@ -1,5 +1,5 @@
 from botasaurus import request as rq, bt
-from botasaurus.cache import DontCache
+from botasaurus.cache import Cache, DontCache
 import requests
 from time import sleep
 
@@ -88,6 +88,10 @@ def perform_scrape_social(reqs, data):
 def perform_scrape_social_pro(reqs, data):
     return do_request(data)
 
+# The socials of a website don't depend on the API key used to get them
+Cache.set_ignored_key_fields(perform_scrape_social, ["key"])
+Cache.set_ignored_key_fields(perform_scrape_social_pro, ["key"])
+
 def is_free():
     FREE_CREDITS_PLUS_10 = 60
     # Assuming bt.LocalStorage is used to get the credits_used value
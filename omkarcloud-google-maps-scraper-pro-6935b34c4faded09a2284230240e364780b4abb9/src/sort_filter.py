@@ -1,126 +1,201 @@
 from src.utils import kebab_case, unicode_to_ascii
 
-def sort_place(places:list, sort):
-     
-    def sorting_key(item):
-        key = sort[0]
-        value = item.get(key)
+NEGATIVE_INFINITY = float("-inf")
+
+def sorting_key(value):
+    # Handle None separately
+    if value is None:
+        return (0,)  # A tuple with a single element to ensure type consistency
+
+    # Return a tuple with type indicator and value
+    return (1, value) if isinstance(value, int) else (2, value)
+
+
+def compile_value_key(places:list, field):
+    """
+    Returns the cheapest key giving the same order as sorting_key for the values of field.
+    """
+    values = [place.get(field) for place in places]
+    types = {type(value) for value in values if value is not None}
+    has_none = len(types) == 0 or any(value is None for value in values)
+
+    # sorting_key puts None first, then ints, then everything else. If all values get the
+    # same type indicator, they can be compared without creating a tuple per place.
+    is_int = types <= {int, bool}
+    is_same_indicator = is_int or not (types & {int, bool})
+    is_number = is_int or types == {float}
+
+    if is_same_indicator and not has_none:
+        def value_key(place):
+            return place.get(field)
+        return value_key
+
+    if is_same_indicator and is_number:
+        def number_key(place):
+            value = place.get(field)
+            return NEGATIVE_INFINITY if value is None else value
+        return number_key
+
+    def key(place):
+        return sorting_key(place.get(field))
+    return key
+
+
+def compile_bool_key(sorts):
+    """
+    Packs consecutive bool sorts into one int key. Sorting by it once gives the same order
+    as sorting by each of them in turn, as the later sorts are the higher bits.
+    """
+    flags = [(sort[0], sort[1]) for sort in sorts]
+
+    def key(place):
+        packed = 0
+        for bit, (field, sorting_order) in enumerate(flags):
+            value = place.get(field, 0)
+            if sorting_order:
+                flag = value is False or value is None
+            else:
+                flag = value is not None
+            packed |= flag << bit
+        return packed
+    return key
+
+
+def compile_sort_plan(places:list, sorts):
+    """
+    Compiles the sorts into a list of (key, reverse) stable sort passes, which give the same order
+    as applying each sort in turn with fewer passes.
+    """
+    plan = []
+    bool_sorts = []
 
-        # Handle None separately
-        if value is None:
-            return (0,)  # A tuple with a single element to ensure type consistency
+    for sort in sorts:
+        if isinstance(sort[1], bool):
+            bool_sorts.append(sort)
+            continue
 
-        # Return a tuple with type indicator and value
-        return (1, value) if isinstance(value, int) else (2, value)
+        if bool_sorts:
+            plan.append((compile_bool_key(bool_sorts), False))
+            bool_sorts = []
+        plan.append((compile_value_key(places, sort[0]), sort[1] == "desc"))
 
-    def sorting_bool_true(item):
-        sorting_by = sort[0]
-        result = item.get(sorting_by, 0)
+    if bool_sorts:
+        plan.append((compile_bool_key(bool_sorts), False))
 
-        if result is True  or result is not None:
-            return 1
+    return plan
 
-        return 0
 
-    def sorting_bool_false(item):
-        sorting_by = sort[0]
-        result = item.get(sorting_by, 0)
+def sort_places(places:list, sorts):
+    for key, reverse in compile_sort_plan(places, sorts):
+        places = sorted(places, key=key, reverse=reverse)
 
-        if result is False  or result is None:
-            return 1
+    return places
 
-        return 0
 
-    sorting_order = sort[1]
+def normalize_category(category):
+    return kebab_case(unicode_to_ascii(category)).lower()
 
-    if isinstance(sorting_order, bool):
-        if sorting_order:
-            sorted_data = sorted(places, key=sorting_bool_false)
-        else: 
-            sorted_data = sorted(places, key=sorting_bool_true)
-    else:
-        sorted_data = sorted(places, key=sorting_key,
-                         reverse=(sorting_order == "desc"))
 
-    return sorted_data
+def is_empty(value):
+    return value == '' or value is None
 
-def sort_places(places:list, sorts):
-    for sort in sorts:
-            places = sort_place(places, sort)
 
-    return places
+def compile_category_check(category_in):
+    # Normalize the allowed categories once, and every distinct main category once.
+    allowed = frozenset(normalize_category(category) for category in category_in)
+    matches = {}
 
+    def check(place):
+        main_category = place.get("main_category")
+        if not main_category:
+            return False
 
-def list_contains_string(string_list, target_string):
-    target_string_lower = kebab_case(unicode_to_ascii(target_string)).lower()  # Convert target string to lowercase
-    for item in string_list:
-        if target_string_lower == kebab_case(unicode_to_ascii(item)).lower():  # Compare in a case-insensitive manner
-            return True
-    return False
+        is_allowed = matches.get(main_category)
+        if is_allowed is None:
+            is_allowed = normalize_category(main_category) in allowed
+            matches[main_category] = is_allowed
+        return is_allowed
+    return check
 
 
-def filter_places(ls, filter_data):
-    def fn(i):
-        min_rating = filter_data.get("min_rating")
-        max_rating = filter_data.get("max_rating")
-        min_reviews = filter_data.get("min_reviews")
-        max_reviews = filter_data.get("max_reviews")
-        has_phone = filter_data.get("has_phone")
-        has_website = filter_data.get("has_website")
-        has_can_claim = filter_data.get("can_claim")
-        category_in = filter_data.get("category_in")
-
-        rating = i.get('rating')
-        reviews = i.get('reviews')
-        web_site = i.get("website")
-        can_claim = i.get("can_claim")
-        
-        phone = i.get("phone")
-        main_category = i.get("main_category")
-
-        if category_in :
-            if not main_category:
-                return False
+def compile_min_check(field, minimum):
+    def check(place):
+        value = place.get(field)
+        return not (is_empty(value) or value < minimum)
+    return check
 
-            if (not list_contains_string(category_in, main_category)):
-                return False
 
-        if min_rating is not None and (rating == '' or rating is None or rating < min_rating):
-            return False
-        
-        if max_rating is not None and (rating == '' or rating is None or rating > max_rating):
-            return False
+def compile_max_check(field, maximum):
+    def check(place):
+        value = place.get(field)
+        return not (is_empty(value) or value > maximum)
+    return check
 
-        if min_reviews is not None and (reviews == '' or reviews is None or reviews < min_reviews):
-            return False
 
-        if max_reviews is not None and (reviews == '' or reviews is None or reviews > max_reviews):
-            return False
+def compile_filter(filter_data):
+    """
+    Compiles the filter data into a predicate, which only checks the active filters.
 
-        if has_website is not None:
-            if (has_website is False and web_site is not None):
-                return False
+    :param filter_data: Dict of filters as created by create_filter_data.
+    :return: Function returning True if a place passes all the filters.
+    """
+    min_rating = filter_data.get("min_rating")
+    max_rating = filter_data.get("max_rating")
+    min_reviews = filter_data.get("min_reviews")
+    max_reviews = filter_data.get("max_reviews")
+    has_phone = filter_data.get("has_phone")
+    has_website = filter_data.get("has_website")
+    has_can_claim = filter_data.get("can_claim")
+    category_in = filter_data.get("category_in")
 
-            if (has_website is True and web_site is None):
-                return False
+    checks = []
 
-        if has_can_claim is not None:
-            if (has_can_claim is False and can_claim is True):
-                return False
+    if category_in:
+        checks.append(compile_category_check(category_in))
 
-            if (has_can_claim is True and can_claim is False):
-                return False
-            
-        if has_phone is not None:
-            if (has_phone is True and (phone is None or phone == '')):
-                return False
+    if min_rating is not None:
+        checks.append(compile_min_check("rating", min_rating))
 
-            if (has_phone is False and (not (phone is None or phone == ''))):
-                return False
+    if max_rating is not None:
+        checks.append(compile_max_check("rating", max_rating))
+
+    if min_reviews is not None:
+        checks.append(compile_min_check("reviews", min_reviews))
+
+    if max_reviews is not None:
+        checks.append(compile_max_check("reviews", max_reviews))
+
+    if has_website is True:
+        checks.append(lambda place: place.get("website") is not None)
+    elif has_website is False:
+        checks.append(lambda place: place.get("website") is None)
 
+    if has_can_claim is True:
+        checks.append(lambda place: place.get("can_claim") is not False)
+    elif has_can_claim is False:
+        checks.append(lambda place: place.get("can_claim") is not True)
+
+    if has_phone is True:
+        checks.append(lambda place: not is_empty(place.get("phone")))
+    elif has_phone is False:
+        checks.append(lambda place: is_empty(place.get("phone")))
+
+    if not checks:
+        return lambda place: True
+
+    if len(checks) == 1:
+        return checks[0]
+
+    def predicate(place):
+        for check in checks:
+            if not check(place):
+                return False
         return True
+    return predicate
+
 
-    return list(filter(fn, ls))
+def filter_places(ls, filter_data):
+    return list(filter(compile_filter(filter_data), ls))
 
 
 def sort_dict_by_keys(dictionary, keys):
@@ -1,7 +1,18 @@
+import re
+from functools import lru_cache
 from botasaurus import bt
 from unidecode import unidecode
 from casefy import kebabcase
 
+NON_ASCII_PATTERN = re.compile(r"[^\x00-\x7f]+")
+
+@lru_cache(maxsize=4096)
+def _cached_unicode_to_ascii(text):
+    return unidecode(text).replace("ë", "e")
+
+def _replace_non_ascii(match):
+    return _cached_unicode_to_ascii(match.group())
+
 def unicode_to_ascii(text):
     """
     Convert unicode text to ASCII, replacing special characters.
@@ -10,8 +21,13 @@ def unicode_to_ascii(text):
     if text is None:
         return None
 
-    # Replacing 'ë' with 'e' and return the ASCII text
-    return unidecode(text).replace("ë", "e")
+    # ASCII text, like urls and most names, is returned as is
+    if text.isascii():
+        return text
+
+    # unidecode transliterates every character on its own, so only the non ASCII runs,
+    # which repeat a lot more than whole texts, need to go through it.
+    return NON_ASCII_PATTERN.sub(_replace_non_ascii, text)
 
 def applyTransformer(data, transformer):
     """
@@ -35,11 +51,41 @@ def applyTransformer(data, transformer):
         return data
 
 
+def applyTransformerInPlace(data, transformer):
+    """
+    Apply a transformer function to all strings in a nested data structure, updating the dicts and lists in place.
+
+    :param data: The data structure (dict, list, nested dicts) to transform.
+    :param transformer: A function that takes a string and returns a transformed string.
+    :return: The transformed data structure, which is the same object as data unless data is a string.
+    """
+    if isinstance(data, str):
+        return transformer(data)
+
+    stack = [data]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            entries = item.items()
+        elif isinstance(item, list):
+            entries = enumerate(item)
+        else:
+            continue
+
+        for key, value in entries:
+            if isinstance(value, str):
+                item[key] = transformer(value)
+            elif isinstance(value, (dict, list)):
+                stack.append(value)
+
+    return data
+
+
 def convert_unicode_dict_to_ascii_dict(data):
     """
-    Convert unicode data to ASCII, replacing special characters.
+    Convert unicode data to ASCII in place, replacing special characters.
     """
-    return applyTransformer(data, unicode_to_ascii)
+    return applyTransformerInPlace(data, unicode_to_ascii)
 
 
 def kebab_case(s):
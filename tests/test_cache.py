@@ -0,0 +1,24 @@
+from botasaurus.cache import Cache, _backend
+from botasaurus.cache_keys import legacy_hash_key
+
+
+def scrape_legacy_place(data):
+    pass
+
+
+def test_legacy_keys_are_replaced_and_removed(tmp_path, monkeypatch):
+    # The cache folder is relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    fn_name = scrape_legacy_place.__name__
+    _backend.setup(fn_name)
+    # Results cached before canonical keys, under the md5 of their input
+    for item in [{"link": "a"}, {"link": "b"}]:
+        _backend.put(fn_name, legacy_hash_key(item), "stale " + item["link"])
+
+    Cache.put_items(scrape_legacy_place, [{"link": "a"}], ["fresh a"])
+    assert Cache.get(scrape_legacy_place, {"link": "a"}) == "fresh a"
+    assert Cache.remove_items(scrape_legacy_place, [{"link": "a"}, {"link": "b"}, {"link": "c"}]) == 2
+
+    assert Cache.get(scrape_legacy_place, {"link": "a"}) is None
+    assert Cache.get(scrape_legacy_place, {"link": "b"}) is None
+    assert _backend.keys(fn_name) == []
@@ -0,0 +1,22 @@
+from botasaurus.cache_backends import FileCacheBackend, SqliteCacheBackend, migrate_file_cache_to_sqlite
+from botasaurus.cache_codecs import GZIP
+
+
+def test_migrate_file_cache_to_sqlite(tmp_path, monkeypatch):
+    # The cache folder is relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    file_backend = FileCacheBackend()
+    file_backend.setup("scrape_place")
+    file_backend.put("scrape_place", "a", {"name": "A", "rating": 4.5})
+    file_backend.put("scrape_place", "b", [1, 2, 3])
+    # A result written with a compressed codec is migrated as well
+    FileCacheBackend(GZIP).put("scrape_place", "c", "C")
+
+    sqlite_backend = SqliteCacheBackend()
+    assert migrate_file_cache_to_sqlite(sqlite_backend, delete_files=True) == 3
+
+    assert sqlite_backend.get("scrape_place", "a") == (True, {"name": "A", "rating": 4.5})
+    assert sqlite_backend.get("scrape_place", "b") == (True, [1, 2, 3])
+    assert sqlite_backend.get("scrape_place", "c") == (True, "C")
+    assert file_backend.fn_names() == []
+    sqlite_backend.close()